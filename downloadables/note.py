@@ -14,12 +14,19 @@ Key bindings:
     Ctrl+S: Save file
     Ctrl+X: Exit
     Ctrl+L: Load file (opens file selector)
+    Ctrl+Z: Undo
+    Ctrl+Y: Redo
 """
 
+import mmap
 import os
+import random
+import shutil
 import sys
 import subprocess
 import tempfile
+import threading
+from collections import OrderedDict, deque
 
 # Try to import curses, with a fallback option
 try:
@@ -41,6 +48,546 @@ except ImportError:
     TKINTER_AVAILABLE = False
 
 
+MAX_PIECE = 4096  # Longest piece; keeps the newline scans inside one piece short
+LARGE_FILE = 16 * 1024 * 1024  # Files at least this big (bytes) are memory-mapped instead of read
+INDEX_BLOCK = 64 * 1024  # Bytes the background indexer decodes at a time, extended to the next newline
+DECODED_BLOCKS = 16  # Decoded blocks kept around for drawing and editing
+MAX_KEY_BATCH = 65536  # Most keys taken from the terminal before the screen is drawn again
+TEXT_KEYS = frozenset(range(32, 127)) | {10}  # Printable ASCII and Enter: keys that just insert text
+UNDO_LIMIT = 4 * 1024 * 1024  # Approximate bytes of undo/redo history kept; the oldest edits go first
+EDIT_OVERHEAD = 200  # Rough bytes per logged edit on top of its text
+
+
+class MappedFile:
+    """A file memory-mapped read-only and indexed into line-aligned blocks in the background
+
+    The indexer thread decodes each block once to count its characters and newlines, then
+    throws the text away; only the blocks something actually reads (the lines on screen,
+    an edit, a save) are decoded again, and a few of those are kept in a small cache.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        # (byte start, byte end, [(char start, chars, newlines), ...]) per block, in file order
+        self.blocks = []
+        self.done = False
+        self._next = 0
+        self._stop = False
+        self._decoded = OrderedDict()
+        # Index the first block right away so the first screen never waits for the thread
+        self._index_block()
+        self._thread = threading.Thread(target=self._index, daemon=True)
+        self._thread.start()
+
+    def _decode(self, start, end):
+        # Blocks end on a newline, so a \r\n pair is never split between two of them
+        return self._map[start:end].decode('utf-8', 'surrogateescape').replace('\r\n', '\n')
+
+    def _index_block(self):
+        start = self._next
+        if start >= len(self._map):
+            self.done = True
+            return
+        end = self._map.find(b'\n', start + INDEX_BLOCK)
+        end = len(self._map) if end < 0 else end + 1
+        text = self._decode(start, end)
+        pieces = []
+        for char_start in range(0, len(text), MAX_PIECE):
+            length = min(MAX_PIECE, len(text) - char_start)
+            pieces.append((char_start, length, text.count('\n', char_start, char_start + length)))
+        self._next = end
+        self.blocks.append((start, end, pieces))
+
+    def _index(self):
+        while not self.done and not self._stop:
+            self._index_block()
+
+    def wait(self):
+        """Block until the whole file is indexed"""
+        self._thread.join()
+
+    def block_text(self, index):
+        text = self._decoded.get(index)
+        if text is None:
+            start, end, _ = self.blocks[index]
+            text = self._decoded[index] = self._decode(start, end)
+            if len(self._decoded) > DECODED_BLOCKS:
+                self._decoded.popitem(last=False)
+        else:
+            self._decoded.move_to_end(index)
+        return text
+
+    def close(self):
+        self._stop = True
+        self._thread.join()
+        self._decoded.clear()
+        self._map.close()
+        self._file.close()
+
+
+class _Piece:
+    """Treap node: one run of text from a buffer chunk, plus totals for its subtree"""
+    __slots__ = ("chunk", "start", "length", "newlines", "priority", "left", "right", "total", "total_newlines")
+
+    def __init__(self, chunk, start, length, newlines, priority=None):
+        self.chunk = chunk
+        self.start = start
+        self.length = length
+        self.newlines = newlines
+        self.priority = random.random() if priority is None else priority
+        self.left = None
+        self.right = None
+        self.total = length
+        self.total_newlines = newlines
+
+    def update(self):
+        self.total = self.length
+        self.total_newlines = self.newlines
+        if self.left:
+            self.total += self.left.total
+            self.total_newlines += self.left.total_newlines
+        if self.right:
+            self.total += self.right.total
+            self.total_newlines += self.right.total_newlines
+
+
+class PieceTable:
+    """Text buffer made of pieces of append-only chunks, kept in an implicit treap
+
+    Chunk 0 is the text the buffer was created with; typed and pasted text is appended to
+    later chunks and never changed. Each treap node is a piece of a chunk, ordered by
+    position in the document, and knows the length and newline count of its subtree, so
+    inserting, deleting and finding the start of a line are all O(log n).
+
+    A buffer made with from_mapped() starts empty and takes its text from a MappedFile:
+    sync() adds each newly indexed block as a chunk, stored as its block number and only
+    decoded when a piece of it is read.
+    """
+
+    def __init__(self, text=""):
+        self._chunks = [text]
+        self._typing_chunk = None
+        self.mapped = None
+        self._synced_blocks = 0
+        pieces = []
+        for start in range(0, len(text), MAX_PIECE):
+            length = min(MAX_PIECE, len(text) - start)
+            pieces.append(_Piece(0, start, length, text.count("\n", start, start + length)))
+        self._root = self._build(pieces)
+
+    @staticmethod
+    def _build(pieces):
+        """Balanced treap over pieces already in document order"""
+
+        def build(lo, hi):
+            if lo >= hi:
+                return None
+            mid = (lo + hi) // 2
+            node = pieces[mid]
+            node.left = build(lo, mid)
+            node.right = build(mid + 1, hi)
+            node.update()
+            return node
+
+        root = build(0, len(pieces))
+        # Hand out priorities level by level so every parent outranks its children
+        priorities = sorted((random.random() for _ in pieces), reverse=True)
+        level = [root] if root else []
+        i = 0
+        while level:
+            for node in level:
+                node.priority = priorities[i]
+                i += 1
+            level = [child for node in level for child in (node.left, node.right) if child]
+        return root
+
+    @classmethod
+    def from_mapped(cls, mapped):
+        table = cls()
+        table.mapped = mapped
+        table.sync()
+        return table
+
+    @property
+    def loading(self):
+        """True while the mapped file still has blocks that are not in the document"""
+        return self.mapped is not None and not (self.mapped.done and self._synced_blocks == len(self.mapped.blocks))
+
+    def sync(self):
+        """Append blocks the indexer has finished since the last call; True if there were any"""
+        if self.mapped is None:
+            return False
+        blocks = self.mapped.blocks
+        count = len(blocks)
+        for index in range(self._synced_blocks, count):
+            self._chunks.append(index)
+            chunk = len(self._chunks) - 1
+            for start, length, newlines in blocks[index][2]:
+                # Anything typed at the end of the loaded text is before the rest of the file
+                self._root = self._merge(self._root, _Piece(chunk, start, length, newlines))
+        added = count > self._synced_blocks
+        self._synced_blocks = count
+        return added
+
+    def finish_loading(self):
+        if self.mapped is not None:
+            self.mapped.wait()
+            self.sync()
+
+    def _chunk_text(self, chunk):
+        text = self._chunks[chunk]
+        if isinstance(text, str):
+            return text
+        return self.mapped.block_text(text)
+
+    def __len__(self):
+        return self._root.total if self._root else 0
+
+    @property
+    def line_count(self):
+        return (self._root.total_newlines if self._root else 0) + 1
+
+    def _merge(self, left, right):
+        if left is None:
+            return right
+        if right is None:
+            return left
+        if left.priority > right.priority:
+            left.right = self._merge(left.right, right)
+            left.update()
+            return left
+        right.left = self._merge(left, right.left)
+        right.update()
+        return right
+
+    def _split(self, node, offset):
+        """Split into (first `offset` characters, the rest), cutting a piece if needed"""
+        if node is None:
+            return None, None
+        left_total = node.left.total if node.left else 0
+        if offset <= left_total:
+            left, node.left = self._split(node.left, offset)
+            node.update()
+            return left, node
+        if offset >= left_total + node.length:
+            node.right, right = self._split(node.right, offset - left_total - node.length)
+            node.update()
+            return node, right
+
+        cut = offset - left_total
+        text = self._chunk_text(node.chunk)
+        head_newlines = text.count("\n", node.start, node.start + cut)
+        tail = _Piece(node.chunk, node.start + cut, node.length - cut, node.newlines - head_newlines, node.priority)
+        tail.right = node.right
+        tail.update()
+        node.length = cut
+        node.newlines = head_newlines
+        node.right = None
+        node.update()
+        return node, tail
+
+    def _extend_last(self, node, text):
+        """Append text to the last piece under node if it ends where its chunk ends"""
+        if node.right is not None:
+            extended = self._extend_last(node.right, text)
+        else:
+            chunk = self._chunks[node.chunk]
+            extended = (node.chunk == self._typing_chunk
+                        and node.start + node.length == len(chunk)
+                        and node.length + len(text) <= MAX_PIECE)
+            if extended:
+                # Chunks only ever grow, so other pieces of this chunk stay valid
+                self._chunks[node.chunk] = chunk + text
+                node.length += len(text)
+                node.newlines += text.count("\n")
+        if extended:
+            node.update()
+        return extended
+
+    def insert(self, offset, text):
+        """Insert text before the character at offset"""
+        if not text:
+            return
+        left, right = self._split(self._root, offset)
+        if left is None or len(text) > MAX_PIECE or not self._extend_last(left, text):
+            # Typing keeps extending one piece; anything else becomes new pieces in new chunks
+            pieces = []
+            for start in range(0, len(text), MAX_PIECE):
+                part = text[start:start + MAX_PIECE]
+                self._chunks.append(part)
+                pieces.append(_Piece(len(self._chunks) - 1, 0, len(part), part.count("\n")))
+            self._typing_chunk = len(self._chunks) - 1
+            new = None
+            for piece in pieces:
+                new = self._merge(new, piece)
+            left = self._merge(left, new)
+        self._root = self._merge(left, right)
+
+    def delete(self, offset, length):
+        """Remove length characters starting at offset"""
+        if length <= 0:
+            return
+        left, rest = self._split(self._root, offset)
+        _, right = self._split(rest, length)
+        self._root = self._merge(left, right)
+
+    def line_start(self, line):
+        """Offset of the first character of a line (0-based)"""
+        if line <= 0:
+            return 0
+        wanted = line  # Find the line-th newline; the line starts right after it
+        node = self._root
+        base = 0
+        while node is not None:
+            left_newlines = node.left.total_newlines if node.left else 0
+            if wanted <= left_newlines:
+                node = node.left
+                continue
+            wanted -= left_newlines
+            base += node.left.total if node.left else 0
+            if wanted <= node.newlines:
+                text = self._chunk_text(node.chunk)
+                position = node.start - 1
+                for _ in range(wanted):
+                    position = text.find("\n", position + 1)
+                return base + position - node.start + 1
+            wanted -= node.newlines
+            base += node.length
+            node = node.right
+        return len(self)
+
+    def line_length(self, line):
+        end = self.line_start(line + 1) - 1 if line + 1 < self.line_count else len(self)
+        return end - self.line_start(line)
+
+    def get_line(self, line):
+        start = self.line_start(line)
+        end = self.line_start(line + 1) - 1 if line + 1 < self.line_count else len(self)
+        return self.substring(start, end)
+
+    def line_of(self, offset):
+        """Line (0-based) that contains offset"""
+        line = 0
+        node = self._root
+        while node is not None:
+            left_total = node.left.total if node.left else 0
+            if offset < left_total:
+                node = node.left
+                continue
+            if node.left:
+                line += node.left.total_newlines
+            offset -= left_total
+            if offset < node.length:
+                return line + self._chunk_text(node.chunk).count("\n", node.start, node.start + offset)
+            line += node.newlines
+            offset -= node.length
+            node = node.right
+        return line
+
+    def offset(self, line, col):
+        """Document offset of a line/column position"""
+        return self.line_start(line) + col
+
+    def substring(self, start, end):
+        parts = []
+        self._collect(self._root, start, end, 0, parts)
+        return "".join(parts)
+
+    def _collect(self, node, start, end, base, parts):
+        while node is not None and start < end:
+            node_start = base + (node.left.total if node.left else 0)
+            node_end = node_start + node.length
+            if start < node_start:
+                self._collect(node.left, start, end, base, parts)
+            if start < node_end and end > node_start:
+                lo = max(start, node_start) - node_start + node.start
+                hi = min(end, node_end) - node_start + node.start
+                parts.append(self._chunk_text(node.chunk)[lo:hi])
+            if end <= node_end:
+                return
+            base = node_end
+            node = node.right
+
+    def chunks(self):
+        """Yield the document text piece by piece, in order"""
+        stack = []
+        node = self._root
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield self._chunk_text(node.chunk)[node.start:node.start + node.length]
+            node = node.right
+
+    def text(self):
+        return "".join(self.chunks())
+
+
+class LineView:
+    """List-of-lines view of a PieceTable, for code written against a list of strings"""
+
+    def __init__(self, table):
+        self.table = table
+
+    def __len__(self):
+        return self.table.line_count
+
+    def _index(self, index):
+        count = self.table.line_count
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError("line index out of range")
+        return index
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.table.get_line(i) for i in range(*index.indices(len(self)))]
+        return self.table.get_line(self._index(index))
+
+    def __setitem__(self, index, text):
+        index = self._index(index)
+        start = self.table.line_start(index)
+        self.table.delete(start, self.table.line_length(index))
+        self.table.insert(start, text)
+
+    def insert(self, index, text):
+        if index >= len(self):
+            self.table.insert(len(self.table), "\n" + text)
+        else:
+            self.table.insert(self.table.line_start(max(0, index)), text + "\n")
+
+    def append(self, text):
+        self.insert(len(self), text)
+
+    def pop(self, index=-1):
+        index = self._index(index)
+        text = self.table.get_line(index)
+        start = self.table.line_start(index)
+        if index + 1 < len(self):
+            self.table.delete(start, len(text) + 1)  # The line and its newline
+        elif index > 0:
+            self.table.delete(start - 1, len(text) + 1)  # The newline before the last line
+        else:
+            self.table.delete(0, len(text))  # The only line: leave it empty
+        return text
+
+    def __iter__(self):
+        pending = ""
+        for chunk in self.table.chunks():
+            lines = (pending + chunk).split("\n")
+            pending = lines.pop()
+            yield from lines
+        yield pending
+
+
+class _Edit:
+    """One undo step: text inserted at or deleted from offset, and the cursor before and after
+
+    Coalesced keystrokes are kept as a list of parts and only joined when the step is undone
+    or redone, so growing a step costs the size of the new text, not of the whole step.
+    """
+    __slots__ = ("kind", "offset", "parts", "backward", "length", "before", "after", "open")
+
+    def __init__(self, kind, offset, text, before, after):
+        self.kind = kind
+        self.offset = offset
+        self.parts = [text]
+        self.backward = None  # Deletes grow forwards (Delete) or backwards (Backspace)
+        self.length = len(text)
+        self.before = before
+        self.after = after
+        self.open = True
+
+    @property
+    def size(self):
+        return EDIT_OVERHEAD + self.length
+
+    @property
+    def text(self):
+        if len(self.parts) > 1:
+            self.parts = ["".join(reversed(self.parts) if self.backward else self.parts)]
+            self.backward = None
+        return self.parts[0]
+
+    def extend(self, kind, offset, text):
+        """Fold the next edit into this one if it continues it; True if it did"""
+        if not self.open or kind != self.kind:
+            return False
+        if kind == "insert":
+            if offset != self.offset + self.length:
+                return False
+        elif offset + len(text) == self.offset and self.backward is not False:
+            self.backward = True
+            self.offset = offset
+        elif offset == self.offset and self.backward is not True:
+            self.backward = False
+        else:
+            return False
+        self.parts.append(text)
+        self.length += len(text)
+        return True
+
+
+class UndoLog:
+    """Undo and redo stacks of edits, coalesced while typing and capped at a memory limit
+
+    Each step stores only the text that changed, so undoing or redoing it costs the size of
+    the change. When the history grows past limit, the oldest undo steps are dropped first.
+    """
+
+    def __init__(self, limit=UNDO_LIMIT):
+        self.limit = limit
+        self.done = deque()
+        self.undone = deque()
+        self.size = 0
+
+    def record(self, kind, offset, text, before, after):
+        for edit in self.undone:
+            self.size -= edit.size
+        self.undone.clear()
+        last = self.done[-1] if self.done else None
+        if last is not None and last.extend(kind, offset, text):
+            last.after = after
+            self.size += len(text)
+        else:
+            last = _Edit(kind, offset, text, before, after)
+            self.done.append(last)
+            self.size += last.size
+        if kind == "insert" and text.endswith("\n"):
+            # One step per typed line
+            last.open = False
+        self._trim()
+
+    def seal(self):
+        """Start a new step with the next edit, e.g. after the cursor moved"""
+        if self.done:
+            self.done[-1].open = False
+
+    def _trim(self):
+        while self.size > self.limit and (self.done or self.undone):
+            edit = self.done.popleft() if self.done else self.undone.popleft()
+            self.size -= edit.size
+
+    def undo(self):
+        if not self.done:
+            return None
+        edit = self.done.pop()
+        edit.open = False
+        self.undone.append(edit)
+        return edit
+
+    def redo(self):
+        if not self.undone:
+            return None
+        edit = self.undone.pop()
+        self.done.append(edit)
+        return edit
+
+
 class ArcNotesFallback:
     """Fallback version when curses is not available"""
 
@@ -124,10 +671,22 @@ class ArcNotesFallback:
 class ArcNotesCurses:
     """Curses-based version of the editor"""
 
-    def __init__(self, stdscr, filename=None):
+    def __init__(self, stdscr, filename=None, undo_limit=UNDO_LIMIT):
         self.stdscr = stdscr
         self.filename = filename if filename else "untitled.arc"
-        self.content = []
+        self.undo_limit = undo_limit
+
+        # What is on the terminal right now, so render() only rewrites what changed
+        self.drawn_rows = []
+        self.drawn_status = None
+        self.drawn_scroll = None
+        self.screen_size = None
+        self.full_redraw = True
+        self.dirty_lines = set()
+        self.dirty_from = sys.maxsize
+
+        self.buffer = None
+        self.load_text("")
         self.current_line = 0
         self.current_col = 0
         self.scroll_y = 0
@@ -144,31 +703,108 @@ class ArcNotesCurses:
         # Load file if provided
         if filename and os.path.exists(filename):
             try:
-                with open(filename, 'r') as f:
-                    self.content = f.read().split('\n')
+                self.load_file(filename)
                 self.set_status(f"Loaded {filename}")
             except Exception as e:
-                self.content = [""]
+                self.load_text("")
                 self.set_status(f"Error loading file: {str(e)}")
         else:
-            self.content = [""]
             if filename:
                 self.set_status(f"New file: {filename}")
             else:
                 self.set_status("New file")
 
+    def load_file(self, path):
+        """Load a file, memory-mapping it instead of reading it if it is large"""
+        if os.path.getsize(path) >= LARGE_FILE:
+            self.set_buffer(PieceTable.from_mapped(MappedFile(path)))
+        else:
+            with open(path, 'r') as f:
+                self.load_text(f.read())
+
+    def load_text(self, text):
+        self.set_buffer(PieceTable(text))
+
+    def set_buffer(self, buffer):
+        """Replace the buffer; self.content stays a list-like view of its lines"""
+        if self.buffer is not None and self.buffer.mapped is not None:
+            self.buffer.mapped.close()
+        self.buffer = buffer
+        self.content = LineView(self.buffer)
+        self.undo_log = UndoLog(self.undo_limit)
+        self.invalidate()
+
+    def sync_buffer(self):
+        """Pull in the lines the background indexer has found since the last frame"""
+        line_count = len(self.content)
+        if self.buffer.sync():
+            self.invalidate(line_count - 1)
+
+    def mark_dirty(self, line):
+        """Redraw one line on the next render"""
+        self.dirty_lines.add(line)
+
+    def invalidate(self, first_line=0):
+        """Redraw every line from first_line down, e.g. after lines were added or removed"""
+        self.dirty_from = min(self.dirty_from, first_line)
+
     def set_status(self, message):
         self.status_message = message
         self.status_timer = 50  # Display for about 5 seconds
 
     def save_file(self):
         try:
-            with open(self.filename, 'w') as f:
-                f.write('\n'.join(self.content))
+            if self.buffer.mapped is not None:
+                self.save_mapped()
+            else:
+                with open(self.filename, 'w') as f:
+                    for chunk in self.buffer.chunks():
+                        f.write(chunk)
             self.set_status(f"Saved {self.filename}")
         except Exception as e:
             self.set_status(f"Error saving file: {str(e)}")
 
+    def save_mapped(self):
+        """Save a memory-mapped buffer through a temporary file
+
+        Writing over the mapped file would change the text the buffer is still reading, so the
+        new contents go next to it and replace it in one step once they are complete.
+        """
+        self.buffer.finish_loading()
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.filename)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', errors='surrogateescape') as f:
+                for chunk in self.buffer.chunks():
+                    f.write(chunk)
+            if os.path.exists(self.filename):
+                shutil.copymode(self.filename, temp_path)
+            if os.name == 'nt':
+                # Windows will not replace a file that is still mapped, so let go of it first
+                mapped = self.buffer.mapped
+                mapped.close()
+                try:
+                    os.replace(temp_path, self.filename)
+                except OSError:
+                    # Nothing changed on disk, so mapping the file again gives the same blocks
+                    self.buffer.mapped = MappedFile(mapped.path)
+                    self.buffer.mapped.wait()
+                    raise
+                self.remap_saved_file()
+            else:
+                # POSIX keeps the old file readable through the map after the rename
+                os.replace(temp_path, self.filename)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    def remap_saved_file(self):
+        """Map the file just saved in place of the closed one, keeping the cursor and undo history"""
+        self.buffer = PieceTable.from_mapped(MappedFile(self.filename))
+        self.buffer.finish_loading()
+        self.content = LineView(self.buffer)
+        self.invalidate()
+
     def open_file_dialog(self):
         """Open a file selection dialog and load the selected file"""
         # Exit curses temporarily
@@ -219,8 +855,7 @@ class ArcNotesCurses:
         else:
             # Load the selected file
             try:
-                with open(new_filename, 'r') as f:
-                    self.content = f.read().split('\n')
+                self.load_file(new_filename)
                 self.filename = new_filename
                 self.current_line = 0
                 self.current_col = 0
@@ -232,11 +867,80 @@ class ArcNotesCurses:
                 print("Press Enter to continue...")
                 input()
 
-        # Return to curses mode
+        # Return to curses mode; the dialog has drawn over the screen
+        self.full_redraw = True
         self.stdscr.refresh()
 
+    def insert_text(self, text):
+        """Insert text at the cursor and move the cursor to its end"""
+        offset = self.buffer.offset(self.current_line, self.current_col)
+        self.buffer.insert(offset, text)
+        self.undo_log.record("insert", offset, text, offset, offset + len(text))
+        newlines = text.count("\n")
+        if newlines:
+            self.invalidate(self.current_line)
+            self.current_line += newlines
+            self.current_col = len(text) - text.rfind("\n") - 1
+        else:
+            self.mark_dirty(self.current_line)
+            self.current_col += len(text)
+
+    def delete_text(self, offset, length):
+        """Delete text, keeping it in the undo log; the cursor is left for the caller to move"""
+        cursor = self.buffer.offset(self.current_line, self.current_col)
+        text = self.buffer.substring(offset, offset + length)
+        self.buffer.delete(offset, length)
+        self.undo_log.record("delete", offset, text, cursor, offset)
+
+    def move_cursor(self, offset):
+        self.current_line = self.buffer.line_of(offset)
+        self.current_col = offset - self.buffer.line_start(self.current_line)
+
+    def undo(self):
+        edit = self.undo_log.undo()
+        if edit is None:
+            self.set_status("Nothing to undo")
+            return
+        if edit.kind == "insert":
+            self.buffer.delete(edit.offset, edit.length)
+        else:
+            self.buffer.insert(edit.offset, edit.text)
+        self.invalidate(self.buffer.line_of(edit.offset))
+        self.move_cursor(edit.before)
+
+    def redo(self):
+        edit = self.undo_log.redo()
+        if edit is None:
+            self.set_status("Nothing to redo")
+            return
+        if edit.kind == "insert":
+            self.buffer.insert(edit.offset, edit.text)
+        else:
+            self.buffer.delete(edit.offset, edit.length)
+        self.invalidate(self.buffer.line_of(edit.offset))
+        self.move_cursor(edit.after)
+
+    def handle_keys(self, keys):
+        """Apply a batch of keys; a run of text keys (a paste, fast typing) is a single insert"""
+        i = 0
+        while i < len(keys):
+            end = i
+            while end < len(keys) and keys[end] in TEXT_KEYS:
+                end += 1
+            if end - i > 1:
+                self.insert_text("".join(map(chr, keys[i:end])))
+                self.scroll_to_cursor()
+                i = end
+                continue
+            if not self.handle_key(keys[i]):
+                return False
+            i += 1
+        return True
+
     def handle_key(self, key):
-        height, width = self.stdscr.getmaxyx()
+        # Moving the cursor ends the current undo step
+        if key in (curses.KEY_UP, curses.KEY_DOWN, curses.KEY_LEFT, curses.KEY_RIGHT):
+            self.undo_log.seal()
 
         # Ctrl+S: Save
         if key == 19:  # Ctrl+S
@@ -252,58 +956,64 @@ class ArcNotesCurses:
             self.open_file_dialog()
             return True
 
+        # Ctrl+Z: Undo
+        elif key == 26:  # Ctrl+Z
+            self.undo()
+
+        # Ctrl+Y: Redo
+        elif key == 25:  # Ctrl+Y
+            self.redo()
+
         # Enter key
         elif key == 10:  # Enter
             # Split the current line at cursor position
-            current_line = self.content[self.current_line]
-            self.content[self.current_line] = current_line[:self.current_col]
-            self.content.insert(self.current_line + 1, current_line[self.current_col:])
-            self.current_line += 1
-            self.current_col = 0
+            self.insert_text("\n")
 
         # Backspace
         elif key == 127 or key == curses.KEY_BACKSPACE:
             if self.current_col > 0:
-                current_line = self.content[self.current_line]
-                self.content[self.current_line] = current_line[:self.current_col - 1] + current_line[self.current_col:]
+                self.delete_text(self.buffer.offset(self.current_line, self.current_col) - 1, 1)
+                self.mark_dirty(self.current_line)
                 self.current_col -= 1
             elif self.current_line > 0:
-                # Join with the previous line
-                self.current_col = len(self.content[self.current_line - 1])
-                self.content[self.current_line - 1] += self.content[self.current_line]
-                self.content.pop(self.current_line)
+                # Join with the previous line by removing the newline between them
+                join_col = self.buffer.line_length(self.current_line - 1)
+                self.delete_text(self.buffer.line_start(self.current_line) - 1, 1)
+                self.current_col = join_col
+                self.invalidate(self.current_line - 1)
                 self.current_line -= 1
 
         # Delete
         elif key == curses.KEY_DC:
-            current_line = self.content[self.current_line]
-            if self.current_col < len(current_line):
-                self.content[self.current_line] = current_line[:self.current_col] + current_line[self.current_col + 1:]
-            elif self.current_line < len(self.content) - 1:
-                # Join with the next line
-                self.content[self.current_line] += self.content[self.current_line + 1]
-                self.content.pop(self.current_line + 1)
+            # Removes the character under the cursor, or the newline that joins the next line
+            offset = self.buffer.offset(self.current_line, self.current_col)
+            if self.current_col < self.buffer.line_length(self.current_line):
+                self.delete_text(offset, 1)
+                self.mark_dirty(self.current_line)
+            elif offset < len(self.buffer):
+                self.delete_text(offset, 1)
+                self.invalidate(self.current_line)
 
         # Arrow keys
         elif key == curses.KEY_UP:
             if self.current_line > 0:
                 self.current_line -= 1
-                self.current_col = min(self.current_col, len(self.content[self.current_line]))
+                self.current_col = min(self.current_col, self.buffer.line_length(self.current_line))
 
         elif key == curses.KEY_DOWN:
             if self.current_line < len(self.content) - 1:
                 self.current_line += 1
-                self.current_col = min(self.current_col, len(self.content[self.current_line]))
+                self.current_col = min(self.current_col, self.buffer.line_length(self.current_line))
 
         elif key == curses.KEY_LEFT:
             if self.current_col > 0:
                 self.current_col -= 1
             elif self.current_line > 0:
                 self.current_line -= 1
-                self.current_col = len(self.content[self.current_line])
+                self.current_col = self.buffer.line_length(self.current_line)
 
         elif key == curses.KEY_RIGHT:
-            if self.current_col < len(self.content[self.current_line]):
+            if self.current_col < self.buffer.line_length(self.current_line):
                 self.current_col += 1
             elif self.current_line < len(self.content) - 1:
                 self.current_line += 1
@@ -311,12 +1021,13 @@ class ArcNotesCurses:
 
         # Regular character
         elif 32 <= key <= 126:  # Printable ASCII
-            current_line = self.content[self.current_line]
-            self.content[self.current_line] = current_line[:self.current_col] + chr(key) + current_line[
-                                                                                           self.current_col:]
-            self.current_col += 1
+            self.insert_text(chr(key))
+
+        self.scroll_to_cursor()
+        return True
 
-        # Handle scrolling
+    def scroll_to_cursor(self):
+        height, width = self.stdscr.getmaxyx()
         if self.current_line < self.scroll_y:
             self.scroll_y = self.current_line
         elif self.current_line >= self.scroll_y + height - 2:
@@ -327,34 +1038,59 @@ class ArcNotesCurses:
         elif self.current_col >= self.scroll_x + width - 5:
             self.scroll_x = self.current_col - width + 6
 
-        return True
-
     def render(self):
-        self.stdscr.clear()
+        """Redraw only the lines, status bar and help text that changed since the last call"""
         height, width = self.stdscr.getmaxyx()
+        if self.full_redraw or self.screen_size != (height, width):
+            # First frame, resize or something else drew over us: repaint everything once
+            self.stdscr.clear()
+            self.drawn_rows = [None] * (height - 2)
+            self.drawn_status = None
+            self.screen_size = (height, width)
+            # Draw shortcuts; they never change, so only on a full repaint
+            help_text = " ^S Save | ^L Load | ^Z Undo | ^Y Redo | ^X Exit "
+            self.stdscr.addstr(height - 2, 0, help_text[:width - 1])
+            self.full_redraw = False
+
+        # A scroll moves every row, so every row gets compared
+        scroll = (self.scroll_y, self.scroll_x)
+        scrolled = scroll != self.drawn_scroll
+        self.drawn_scroll = scroll
 
         # Draw content
+        line_count = len(self.content)
         for y in range(height - 2):
             line_num = y + self.scroll_y
-            if line_num < len(self.content):
+            if not (scrolled or self.drawn_rows[y] is None or line_num in self.dirty_lines
+                    or line_num >= self.dirty_from):
+                continue
+            if line_num < line_count:
                 line = self.content[line_num]
                 line_to_draw = line[self.scroll_x:self.scroll_x + width - 1]
+            else:
+                line_to_draw = ""
+            if line_to_draw != self.drawn_rows[y]:
+                self.stdscr.move(y, 0)
+                self.stdscr.clrtoeol()
                 self.stdscr.addstr(y, 0, line_to_draw)
+                self.drawn_rows[y] = line_to_draw
+        self.dirty_lines.clear()
+        self.dirty_from = sys.maxsize
 
         # Draw status bar
-        status_line = f" {self.filename} | Line: {self.current_line + 1}/{len(self.content)} | Col: {self.current_col + 1} "
+        # A trailing + on the line count means a large file is still being indexed
+        more = "+" if self.buffer.loading else ""
+        status_line = f" {self.filename} | Line: {self.current_line + 1}/{line_count}{more} | Col: {self.current_col + 1} "
         if self.status_timer > 0:
             status_line += f"| {self.status_message}"
             self.status_timer -= 1
 
-        status_line = status_line.ljust(width)
-        self.stdscr.attron(curses.color_pair(1))
-        self.stdscr.addstr(height - 1, 0, status_line[:width - 1])
-        self.stdscr.attroff(curses.color_pair(1))
-
-        # Draw shortcuts
-        help_text = " ^S Save | ^L Load | ^X Exit "
-        self.stdscr.addstr(height - 2, 0, help_text)
+        status_line = status_line.ljust(width)[:width - 1]
+        if status_line != self.drawn_status:
+            self.stdscr.attron(curses.color_pair(1))
+            self.stdscr.addstr(height - 1, 0, status_line)
+            self.stdscr.attroff(curses.color_pair(1))
+            self.drawn_status = status_line
 
         # Position cursor
         cursor_y = self.current_line - self.scroll_y
@@ -368,14 +1104,39 @@ class ArcNotesCurses:
 
         running = True
         while running:
+            self.sync_buffer()
             self.render()
-            key = self.stdscr.getch()
-            running = self.handle_key(key)
+            # While a large file is being indexed, wake up now and then to show the new lines
+            self.stdscr.timeout(100 if self.buffer.loading else -1)
+            running = self.handle_keys(self.read_keys())
+
+    def read_keys(self):
+        """Wait for a key, then take every key already queued behind it without waiting
+
+        A paste arrives as thousands of keys at once; handling them as one batch means one
+        render for the whole paste instead of one per character.
+        """
+        key = self.stdscr.getch()
+        if key == -1:
+            return []
+        keys = [key]
+        self.stdscr.nodelay(True)
+        try:
+            while len(keys) < MAX_KEY_BATCH:
+                key = self.stdscr.getch()
+                if key == -1:
+                    break
+                keys.append(key)
+        finally:
+            self.stdscr.nodelay(False)
+        return keys
 
 
 def main_curses(stdscr):
     """Main function for curses version"""
-    curses.cbreak()
+    # Raw rather than cbreak, so ^Z, ^Y and ^S reach the editor instead of suspending the
+    # process or pausing terminal output
+    curses.raw()
     curses.noecho()
     stdscr.keypad(True)
 
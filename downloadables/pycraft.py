@@ -1,24 +1,62 @@
 # PLEASE INSTALL ursina, numpy, and perlin_noise, FROM PIP FOR THIS TO WORK AT ALL
 
+from time import perf_counter
+STARTUP_BEGIN = perf_counter()  # Taken before the engine import so startup timings include it
+
 from ursina import *
 from ursina.prefabs.first_person_controller import FirstPersonController
 import numpy as np
 import time
 import random
+import argparse
+import atexit
+import bisect
+import json
+import math
+import os
+import select
+import selectors
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import tracemalloc
 from perlin_noise import PerlinNoise  # Make sure to pip install perlin-noise
 
 # Render settings for better performance
 from ursina.shaders import lit_with_shadows_shader
 
-# Set some application optimizations
-app = Ursina(title="Minecraft Clone", vsync=False)
-window.borderless = False
-window.fullscreen = False
-window.exit_button.visible = False
-window.fps_counter.enabled = True
-
-# Reduce shadow quality for better performance
-DirectionalLight(y=2, z=3, shadows=True, shadow_resolution=512)
+# Command line options (unknown arguments are left for the engine)
+parser = argparse.ArgumentParser(description="PyCraft")
+parser.add_argument("--seed", type=int, default=None, help="World seed, for reproducible terrain")
+parser.add_argument("--replay", default=None,
+                    help="Run the streaming benchmark along a path: sprint, circle, teleport or a recorded path file")
+parser.add_argument("--replay-duration", type=float, default=30.0, help="Simulated seconds to replay")
+parser.add_argument("--replay-out", default=None, help="Write the replay frame log and summary to this JSON file")
+parser.add_argument("--replay-compare", default=None, help="Compare the replay summary against an earlier --replay-out file")
+parser.add_argument("--record-path", default=None, help="Record the player's path to this file for later --replay")
+parser.add_argument("--memory-report", action="store_true",
+                    help="Trace allocations from launch and print a memory report once the world is loaded "
+                         "(or when a replay ends)")
+parser.add_argument("--headless", action="store_true", help="Render offscreen, for benchmark and report runs")
+parser.add_argument("--world-server", default=None, metavar="SOCKET",
+                    help="Run only the world server (generation, storage, edits) on this Unix socket, without a window")
+parser.add_argument("--connect", default=None, metavar="SOCKET",
+                    help="Get the world from a world server on this Unix socket, starting one if none is running")
+parser.add_argument("--world-dir", default="pycraft_world", help="Where the world server stores region files")
+parser.add_argument("--check-index", action="store_true",
+                    help="Check the block index's neighbour and box queries against a brute-force scan, then exit")
+args, _ = parser.parse_known_args()
+
+if args.memory_report:
+    tracemalloc.start()
+
+# A replay is only comparable between runs if the world is the same
+if args.replay and args.seed is None:
+    args.seed = 1
+if args.seed is not None:
+    random.seed(args.seed)
 
 # Global variables
 BLOCK_TYPES = {
@@ -39,12 +77,12 @@ WORLD_HEIGHT = 20
 # Performance optimization
 MAX_BLOCKS_PER_FRAME = 50  # Limit blocks created per frame
 CHUNK_LOAD_INTERVAL = 0.5  # Time in seconds between chunk updates
+PROGRESSIVE_STARTUP = True  # Only load the spawn chunk before the first frame, stream in the rest
 
 # Global objects
 player = None
 pause_menu = None
 chunks = {}  # Dictionary to store chunks: key = (chunk_x, chunk_z)
-active_blocks = {}  # Dictionary to store only active blocks: key = position tuple, value = block entity
 
 # Generate terrain with Perlin noise
 terrain_noise = PerlinNoise(octaves=2, seed=random.randint(1, 1000))
@@ -69,254 +107,711 @@ def is_water_area(x, z):
     return water_val > 0.1 and height <= 2
 
 
+# Blocks inside a chunk are keyed by a packed local index: y in the high bits, x and z in the low bits.
+# Python ints make this work for negative y as well (e.g. blocks placed under bedrock).
+LOCAL_XZ_BITS = (CHUNK_SIZE * CHUNK_SIZE - 1).bit_length()
+LOCAL_XZ_MASK = (1 << LOCAL_XZ_BITS) - 1
+
+
+def pack_local(x, y, z):
+    """Pack chunk-local coordinates into one int"""
+    return (y << LOCAL_XZ_BITS) | (z * CHUNK_SIZE + x)
+
+
+def unpack_local(key):
+    """Inverse of pack_local: (x, y, z) chunk-local coordinates"""
+    xz = key & LOCAL_XZ_MASK
+    return xz % CHUNK_SIZE, key >> LOCAL_XZ_BITS, xz // CHUNK_SIZE
+
+
+def split_world_position(x, y, z):
+    """Split integer world coordinates into (chunk_pos, packed local index)"""
+    chunk_x, chunk_z = x // CHUNK_SIZE, z // CHUNK_SIZE
+    return (chunk_x, chunk_z), pack_local(x - chunk_x * CHUNK_SIZE, y, z - chunk_z * CHUNK_SIZE)
+
+
+def world_coordinates(position):
+    """Integer world coordinates of a position; rounding keeps float noise (e.g. 2.9999) on the right block"""
+    return round(position[0]), round(position[1]), round(position[2])
+
+
+class BlockIndex:
+    """World-level block lookup keyed by integer coordinates
+
+    Blocks live in one dictionary per chunk, keyed by packed local index; each chunk's
+    dictionary is also that Chunk's `blocks`, so there is a single copy of every block.
+    """
+
+    def __init__(self):
+        self.chunks = {}  # (chunk_x, chunk_z) -> {packed local index: block data}
+
+    def chunk_blocks(self, chunk_pos):
+        """The block dictionary of a chunk, created empty if needed"""
+        blocks = self.chunks.get(chunk_pos)
+        if blocks is None:
+            blocks = self.chunks[chunk_pos] = {}
+        return blocks
+
+    def locate(self, position):
+        """(chunk_pos, packed local index) of a world position, rounded to the block it is in"""
+        return split_world_position(*world_coordinates(position))
+
+    def get(self, x, y, z):
+        """Block data at integer world coordinates, or None"""
+        chunk_pos, key = split_world_position(x, y, z)
+        blocks = self.chunks.get(chunk_pos)
+        return blocks.get(key) if blocks is not None else None
+
+    def world_position(self, chunk_pos, key):
+        """Integer world coordinates of a packed local index in a chunk"""
+        x, y, z = unpack_local(key)
+        return chunk_pos[0] * CHUNK_SIZE + x, y, chunk_pos[1] * CHUNK_SIZE + z
+
+    def neighbors(self, x, y, z):
+        """Blocks sharing a face with (x, y, z), as {(x, y, z): block data}"""
+        found = {}
+        for dx, dy, dz in ((1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1)):
+            block_data = self.get(x + dx, y + dy, z + dz)
+            if block_data is not None:
+                found[(x + dx, y + dy, z + dz)] = block_data
+        return found
+
+    def query_box(self, x0, y0, z0, x1, y1, z1):
+        """Yield ((x, y, z), block data) for every block in the inclusive box between two corners"""
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        z0, z1 = min(z0, z1), max(z0, z1)
+
+        for chunk_x in range(x0 // CHUNK_SIZE, x1 // CHUNK_SIZE + 1):
+            for chunk_z in range(z0 // CHUNK_SIZE, z1 // CHUNK_SIZE + 1):
+                blocks = self.chunks.get((chunk_x, chunk_z))
+                if not blocks:
+                    continue
+
+                # Box clipped to this chunk, in local coordinates
+                lx0 = max(x0 - chunk_x * CHUNK_SIZE, 0)
+                lx1 = min(x1 - chunk_x * CHUNK_SIZE, CHUNK_SIZE - 1)
+                lz0 = max(z0 - chunk_z * CHUNK_SIZE, 0)
+                lz1 = min(z1 - chunk_z * CHUNK_SIZE, CHUNK_SIZE - 1)
+                volume = (lx1 - lx0 + 1) * (y1 - y0 + 1) * (lz1 - lz0 + 1)
+
+                if volume < len(blocks):
+                    # Small box: probe each cell
+                    for y in range(y0, y1 + 1):
+                        for lz in range(lz0, lz1 + 1):
+                            for lx in range(lx0, lx1 + 1):
+                                block_data = blocks.get(pack_local(lx, y, lz))
+                                if block_data is not None:
+                                    yield (chunk_x * CHUNK_SIZE + lx, y, chunk_z * CHUNK_SIZE + lz), block_data
+                else:
+                    # Box covers most of the chunk: filter its blocks instead
+                    for key, block_data in blocks.items():
+                        lx, y, lz = unpack_local(key)
+                        if lx0 <= lx <= lx1 and y0 <= y <= y1 and lz0 <= lz <= lz1:
+                            yield (chunk_x * CHUNK_SIZE + lx, y, chunk_z * CHUNK_SIZE + lz), block_data
+
+
+world_index = BlockIndex()
+
+
+def check_block_index(trials=200):
+    """Compare BlockIndex.neighbors and query_box with a scan of every block; returns the mismatches found"""
+    rng = random.Random(0)
+    index = BlockIndex()
+    blocks = {}  # (x, y, z) -> block data, the brute-force reference
+    span = 2 * CHUNK_SIZE  # Chunks -2..1 on each axis, so queries cross borders and negative coordinates
+    for _ in range(3000):
+        x, y, z = rng.randrange(-span, span), rng.randrange(-6, 6), rng.randrange(-span, span)
+        chunk_pos, key = split_world_position(x, y, z)
+        blocks[(x, y, z)] = index.chunk_blocks(chunk_pos)[key] = {'type': 'STONE', 'entity': None}
+
+    failures = []
+    for _ in range(trials):
+        x, y, z = rng.randrange(-span, span), rng.randrange(-6, 6), rng.randrange(-span, span)
+        expected = {
+            (x + dx, y + dy, z + dz): blocks[(x + dx, y + dy, z + dz)]
+            for dx, dy, dz in ((1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1))
+            if (x + dx, y + dy, z + dz) in blocks
+        }
+        if index.neighbors(x, y, z) != expected:
+            failures.append(('neighbors', (x, y, z)))
+
+        # Boxes from a single cell up to several chunks wide, given with the corners either way round
+        size = rng.choice((0, 1, 3, CHUNK_SIZE, 3 * CHUNK_SIZE))
+        corners = (x, y, z, x + rng.randint(-size, size), y + rng.randint(-3, 3), z + rng.randint(-size, size))
+        x0, y0, z0, x1, y1, z1 = corners
+        expected = {
+            pos for pos in blocks
+            if min(x0, x1) <= pos[0] <= max(x0, x1) and min(y0, y1) <= pos[1] <= max(y0, y1) and
+            min(z0, z1) <= pos[2] <= max(z0, z1)
+        }
+        found = [pos for pos, _ in index.query_box(*corners)]
+        if len(found) != len(set(found)) or set(found) != expected:
+            failures.append(('query_box', corners))
+    return failures
+
+
+def generate_chunk_blocks(chunk_pos):
+    """Generate the terrain of a chunk as {local index: block_type}"""
+    chunk_x, chunk_z = chunk_pos
+    world_x_start = chunk_x * CHUNK_SIZE
+    world_z_start = chunk_z * CHUNK_SIZE
+    blocks = {}
+
+    # Generate terrain for this chunk using Perlin noise
+    for x in range(CHUNK_SIZE):
+        for z in range(CHUNK_SIZE):
+            # Calculate absolute world position
+            world_x = world_x_start + x
+            world_z = world_z_start + z
+
+            # Use Perlin noise for height
+            height = get_height(world_x, world_z)
+
+            # Check if this should be a water area
+            is_water = is_water_area(world_x, world_z)
+
+            if is_water:
+                # Create water block at level 2
+                blocks[pack_local(x, 2, z)] = 'WATER'
+
+                # Create sand under water
+                blocks[pack_local(x, 1, z)] = 'SAND'
+            else:
+                # Create top block
+                block_type = 'GRASS'
+                # Sometimes add sand patches
+                if height <= 2 and terrain_noise([world_x / 15, world_z / 15]) > 0.3:
+                    block_type = 'SAND'
+
+                blocks[pack_local(x, height, z)] = block_type
+
+                # Create dirt blocks below surface
+                for y in range(max(0, height - 1), max(0, height - 3), -1):
+                    blocks[pack_local(x, y, z)] = 'DIRT'
+
+                # Stone at bottom layers
+                for y in range(max(0, height - 3), 1, -1):
+                    blocks[pack_local(x, y, z)] = 'STONE'
+
+                # Occasionally add trees or wood blocks (simplified)
+                tree_value = tree_noise([world_x / 20, world_z / 20])
+                if block_type == 'GRASS' and tree_value > 0.6 and random.random() > 0.8:
+                    # Add a simple tree trunk (just a column of wood blocks)
+                    tree_height = random.randint(3, 5)
+                    for y in range(1, tree_height + 1):
+                        blocks[pack_local(x, height + y, z)] = 'WOOD'
+
+            # Add bedrock at y=0 (unbreakable bottom layer)
+            blocks[pack_local(x, 0, z)] = 'BEDROCK'
+
+    return blocks
+
+
+# World server: an optional separate process that owns generation, the region store and block edits.
+# Clients talk to it over a Unix domain socket using length-prefixed binary messages.
+MSG_GET_CHUNK = 1  # client -> server: chunk_x, chunk_z
+MSG_CHUNK = 2  # server -> client: encoded chunk
+MSG_EDIT = 3  # client -> server: x, y, z, block type id (NO_BLOCK to remove)
+MSG_EDIT_RESULT = 4  # server -> editing client: x, y, z, block type id now at that position
+MSG_BLOCK_CHANGED = 5  # server -> other clients that have the chunk: x, y, z, block type id
+
+FRAME_HEADER = struct.Struct('<BI')  # message type, payload length
+CHUNK_POS = struct.Struct('<ii')
+CHUNK_HEADER = struct.Struct('<iiI')  # chunk_x, chunk_z, block count
+BLOCK_EDIT = struct.Struct('<iiiB')
+BLOCK_RECORD = np.dtype([('xz', 'u1'), ('y', '<i2'), ('type', 'u1')])  # 4 bytes per block
+BLOCK_TYPE_NAMES = list(BLOCK_TYPES)
+BLOCK_TYPE_IDS = {name: i for i, name in enumerate(BLOCK_TYPE_NAMES)}
+NO_BLOCK = 255
+REQUEST_FORMATS = {MSG_GET_CHUNK: CHUNK_POS, MSG_EDIT: BLOCK_EDIT}  # What a client may send, and its payload layout
+MIN_BLOCK_Y, MAX_BLOCK_Y = -2 ** 15, 2 ** 15 - 1  # Heights a BLOCK_RECORD can store
+
+REGION_SIZE = 8  # Chunks per region file side
+REGION_FLUSH_INTERVAL = 5  # Seconds between writes of modified regions
+SERVER_START_TIMEOUT = 10  # Seconds to wait for a spawned world server to accept connections
+
+
+def encode_frame(msg_type, payload):
+    return FRAME_HEADER.pack(msg_type, len(payload)) + payload
+
+
+def encode_chunk(chunk_pos, block_types):
+    """Encode {local index: block_type} as a compact binary chunk"""
+    records = np.array(
+        [(key & LOCAL_XZ_MASK, key >> LOCAL_XZ_BITS, BLOCK_TYPE_IDS[block_type]) for key, block_type in block_types.items()],
+        dtype=BLOCK_RECORD
+    )
+    return CHUNK_HEADER.pack(chunk_pos[0], chunk_pos[1], len(records)) + records.tobytes()
+
+
+def decode_chunk(payload):
+    """Decode a binary chunk back into (chunk_pos, {local index: block_type})"""
+    chunk_x, chunk_z, count = CHUNK_HEADER.unpack_from(payload)
+    records = np.frombuffer(payload, dtype=BLOCK_RECORD, count=count, offset=CHUNK_HEADER.size)
+    block_types = {
+        (y << LOCAL_XZ_BITS) | xz: BLOCK_TYPE_NAMES[block_type]
+        for xz, y, block_type in records.tolist()
+    }
+    return (chunk_x, chunk_z), block_types
+
+
+class FrameReader:
+    """Reassembles length-prefixed frames from a byte stream"""
+
+    def __init__(self, max_length=None):
+        self.buffer = bytearray()
+        self.max_length = max_length  # Longer frames are refused instead of buffered
+
+    def feed(self, data):
+        self.buffer += data
+        frames = []
+        while len(self.buffer) >= FRAME_HEADER.size:
+            msg_type, length = FRAME_HEADER.unpack_from(self.buffer)
+            if self.max_length is not None and length > self.max_length:
+                raise ValueError(f"frame of {length} bytes is over the {self.max_length} byte limit")
+            end = FRAME_HEADER.size + length
+            if len(self.buffer) < end:
+                break
+            frames.append((msg_type, bytes(self.buffer[FRAME_HEADER.size:end])))
+            del self.buffer[:end]
+        return frames
+
+
+class RegionStore:
+    """Chunk storage on disk, one file per REGION_SIZE x REGION_SIZE chunks"""
+
+    def __init__(self, world_dir):
+        self.world_dir = world_dir
+        self.regions = {}  # region_pos -> {chunk_pos: {local index: block_type}}
+        self.dirty = set()
+        os.makedirs(world_dir, exist_ok=True)
+
+    def region_path(self, region_pos):
+        return os.path.join(self.world_dir, f"r.{region_pos[0]}.{region_pos[1]}.bin")
+
+    def region(self, chunk_pos):
+        region_pos = (chunk_pos[0] // REGION_SIZE, chunk_pos[1] // REGION_SIZE)
+        if region_pos not in self.regions:
+            region = {}
+            path = self.region_path(region_pos)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    data = f.read()
+                offset = 0
+                while offset < len(data):
+                    (length,) = struct.unpack_from('<I', data, offset)
+                    pos, block_types = decode_chunk(data[offset + 4:offset + 4 + length])
+                    region[pos] = block_types
+                    offset += 4 + length
+            self.regions[region_pos] = region
+        return region_pos, self.regions[region_pos]
+
+    def get(self, chunk_pos):
+        return self.region(chunk_pos)[1].get(chunk_pos)
+
+    def put(self, chunk_pos, block_types):
+        region_pos, region = self.region(chunk_pos)
+        region[chunk_pos] = block_types
+        self.dirty.add(region_pos)
+
+    def mark_dirty(self, chunk_pos):
+        self.dirty.add((chunk_pos[0] // REGION_SIZE, chunk_pos[1] // REGION_SIZE))
+
+    def flush(self):
+        """Write modified regions, atomically so a crash never leaves a half-written file"""
+        for region_pos in self.dirty:
+            parts = []
+            for chunk_pos, block_types in self.regions[region_pos].items():
+                encoded = encode_chunk(chunk_pos, block_types)
+                parts.append(struct.pack('<I', len(encoded)) + encoded)
+            path = self.region_path(region_pos)
+            with open(path + '.tmp', 'wb') as f:
+                f.write(b''.join(parts))
+            os.replace(path + '.tmp', path)
+        self.dirty.clear()
+
+
+class WorldServer:
+    """Serves chunks and applies block edits for any number of local clients"""
+
+    def __init__(self, socket_path, world_dir):
+        self.socket_path = socket_path
+        self.store = RegionStore(world_dir)
+        self.selector = selectors.DefaultSelector()
+        self.clients = {}  # socket -> {'reader', 'outbox', 'chunks'}
+        self.listener = None
+        self.last_flush = perf_counter()
+
+    def start(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # Left over from a server that did not shut down cleanly
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(self.socket_path)
+        self.listener.listen()
+        self.listener.setblocking(False)
+        self.selector.register(self.listener, selectors.EVENT_READ)
+
+    def close(self):
+        self.store.flush()
+        for client in list(self.clients):
+            self.disconnect(client)
+        if self.listener:
+            self.selector.unregister(self.listener)
+            self.listener.close()
+            self.listener = None
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def get_chunk(self, chunk_pos):
+        block_types = self.store.get(chunk_pos)
+        if block_types is None:
+            block_types = generate_chunk_blocks(chunk_pos)
+            self.store.put(chunk_pos, block_types)
+        return block_types
+
+    def apply_edit(self, x, y, z, type_id):
+        """Apply an edit; returns the block type id at the position afterwards"""
+        chunk_pos, key = split_world_position(x, y, z)
+        block_types = self.get_chunk(chunk_pos)
+        current = block_types.get(key)
+
+        if type_id == NO_BLOCK:
+            if current is not None and current != 'BEDROCK':
+                del block_types[key]
+                current = None
+        elif current is None and type_id < len(BLOCK_TYPE_NAMES):
+            current = block_types[key] = BLOCK_TYPE_NAMES[type_id]
+
+        self.store.mark_dirty(chunk_pos)
+        return NO_BLOCK if current is None else BLOCK_TYPE_IDS[current]
+
+    def send(self, client, msg_type, payload):
+        state = self.clients[client]
+        if not state['outbox']:
+            self.selector.modify(client, selectors.EVENT_READ | selectors.EVENT_WRITE)
+        state['outbox'] += encode_frame(msg_type, payload)
+
+    def handle(self, client, msg_type, payload):
+        """Serve one request; raises ValueError for a request no well-behaved client sends"""
+        request_format = REQUEST_FORMATS.get(msg_type)
+        if request_format is None:
+            raise ValueError(f"unexpected message type {msg_type}")
+        if len(payload) != request_format.size:
+            raise ValueError(f"message type {msg_type} has {len(payload)} payload bytes, expected {request_format.size}")
+
+        state = self.clients[client]
+        if msg_type == MSG_GET_CHUNK:
+            chunk_pos = CHUNK_POS.unpack(payload)
+            state['chunks'].add(chunk_pos)
+            self.send(client, MSG_CHUNK, encode_chunk(chunk_pos, self.get_chunk(chunk_pos)))
+        elif msg_type == MSG_EDIT:
+            x, y, z, type_id = BLOCK_EDIT.unpack(payload)
+            if not MIN_BLOCK_Y <= y <= MAX_BLOCK_Y:
+                raise ValueError(f"edit at height {y} is outside the storable range")
+            result = BLOCK_EDIT.pack(x, y, z, self.apply_edit(x, y, z, type_id))
+            self.send(client, MSG_EDIT_RESULT, result)
+
+            # Let every other client that holds this chunk know
+            chunk_pos = split_world_position(x, y, z)[0]
+            for other, other_state in self.clients.items():
+                if other is not client and chunk_pos in other_state['chunks']:
+                    self.send(other, MSG_BLOCK_CHANGED, result)
+
+    def disconnect(self, client):
+        self.selector.unregister(client)
+        client.close()
+        del self.clients[client]
+
+    def poll(self, timeout=None):
+        """Run one round of the event loop"""
+        for key, events in self.selector.select(timeout):
+            sock = key.fileobj
+            if sock is self.listener:
+                client, _ = self.listener.accept()
+                client.setblocking(False)
+                self.clients[client] = {
+                    'reader': FrameReader(max(request_format.size for request_format in REQUEST_FORMATS.values())),
+                    'outbox': bytearray(),
+                    'chunks': set(),
+                }
+                self.selector.register(client, selectors.EVENT_READ)
+                continue
+
+            if events & selectors.EVENT_READ:
+                try:
+                    data = sock.recv(65536)
+                except ConnectionError:
+                    data = b''
+                if not data:
+                    self.disconnect(sock)
+                    continue
+                try:
+                    for msg_type, payload in self.clients[sock]['reader'].feed(data):
+                        self.handle(sock, msg_type, payload)
+                except ValueError as error:
+                    # A broken or hostile client only loses its own connection
+                    print(f"World server: dropping a client that sent a bad request ({error})", file=sys.stderr)
+                    self.disconnect(sock)
+                    continue
+
+            if events & selectors.EVENT_WRITE and sock in self.clients:
+                state = self.clients[sock]
+                try:
+                    sent = sock.send(state['outbox'])
+                except BlockingIOError:
+                    sent = 0
+                except ConnectionError:
+                    self.disconnect(sock)
+                    continue
+                del state['outbox'][:sent]
+                if not state['outbox']:
+                    self.selector.modify(sock, selectors.EVENT_READ)
+
+        if self.store.dirty and perf_counter() - self.last_flush > REGION_FLUSH_INTERVAL:
+            self.store.flush()
+            self.last_flush = perf_counter()
+
+    def serve_forever(self):
+        self.start()
+        print(f"World server listening on {self.socket_path} (world in {self.store.world_dir})")
+        # A game that started this server stops it with SIGTERM; leave through close() so edits are flushed
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit())
+        try:
+            while True:
+                self.poll(timeout=REGION_FLUSH_INTERVAL)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+
+class WorldClient:
+    """Game-side connection to a world server"""
+
+    def __init__(self, socket_path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(socket_path)
+        self.sock.setblocking(False)
+        self.reader = FrameReader()
+        self.pending = []  # Frames received while waiting for something else
+        self.lost = False  # Set when a send finds the server gone; the next poll reports it
+
+    def send(self, msg_type, payload):
+        if self.lost:
+            return
+        self.sock.setblocking(True)
+        try:
+            self.sock.sendall(encode_frame(msg_type, payload))
+        except ConnectionError:
+            self.lost = True
+        finally:
+            self.sock.setblocking(False)
+
+    def request_chunk(self, chunk_pos):
+        self.send(MSG_GET_CHUNK, CHUNK_POS.pack(*chunk_pos))
+
+    def send_edit(self, x, y, z, block_type):
+        type_id = NO_BLOCK if block_type is None else BLOCK_TYPE_IDS[block_type]
+        self.send(MSG_EDIT, BLOCK_EDIT.pack(x, y, z, type_id))
+
+    def poll(self):
+        """Return all frames that have arrived, without blocking"""
+        frames, self.pending = self.pending, []
+        if self.lost:
+            raise ConnectionError("World server connection was lost")
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except BlockingIOError:
+                break
+            if not data:
+                raise ConnectionError("World server closed the connection")
+            frames.extend(self.reader.feed(data))
+        return frames
+
+    def wait_for_chunk(self, chunk_pos, timeout=SERVER_START_TIMEOUT):
+        """Block until the given chunk arrives (used for the spawn chunk)"""
+        deadline = perf_counter() + timeout
+        while perf_counter() < deadline:
+            select.select([self.sock], [], [], 0.05)
+            for msg_type, payload in self.poll():
+                if msg_type == MSG_CHUNK and CHUNK_HEADER.unpack_from(payload)[:2] == tuple(chunk_pos):
+                    return decode_chunk(payload)[1]
+                self.pending.append((msg_type, payload))
+        raise TimeoutError(f"World server did not send chunk {chunk_pos}")
+
+
+def connect_to_world_server(socket_path):
+    """Connect to a world server, starting one in the background if none is running"""
+    try:
+        return WorldClient(socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        pass
+
+    command = [sys.executable, os.path.abspath(__file__), '--world-server', socket_path, '--world-dir', args.world_dir]
+    if args.seed is not None:
+        command += ['--seed', str(args.seed)]
+    server = subprocess.Popen(command)
+    atexit.register(stop_world_server, server)
+
+    deadline = perf_counter() + SERVER_START_TIMEOUT
+    while True:
+        try:
+            return WorldClient(socket_path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            if perf_counter() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def stop_world_server(server):
+    """Stop a world server this game started; it flushes its regions on the way out"""
+    if server.poll() is None:
+        server.terminate()
+        try:
+            server.wait(timeout=SERVER_START_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+# Check the block index only: no window, no game
+if args.check_index:
+    index_failures = check_block_index()
+    for query, where in index_failures:
+        print(f"{query} disagrees with a full scan at {where}")
+    print("Block index queries match a full scan" if not index_failures else f"{len(index_failures)} mismatches")
+    sys.exit(1 if index_failures else 0)
+
+
+# Run as a world server only: no window, no game
+if args.world_server:
+    WorldServer(args.world_server, args.world_dir).serve_forever()
+    sys.exit()
+
+
+# Set some application optimizations
+app = Ursina(title="Minecraft Clone", vsync=False, window_type='offscreen' if args.headless else 'onscreen')
+if args.headless:
+    # An offscreen buffer has no window properties, so there is no cursor to lock either.
+    # Only this mouse instance changes; the engine's Mouse class is left alone.
+    mouse.__class__ = type('HeadlessMouse', (type(mouse),),
+                           {'locked': property(lambda self: False, lambda self, value: None)})
+else:
+    window.borderless = False
+    window.fullscreen = False
+    window.exit_button.visible = False
+    window.fps_counter.enabled = True
+
+# Reduce shadow quality for better performance
+DirectionalLight(y=2, z=3, shadows=True, shadow_resolution=512)
+
+
 class Chunk:
     def __init__(self, position):
         self.position = position  # (chunk_x, chunk_z)
-        self.blocks = {}  # Local dictionary of blocks within this chunk
+        self.blocks = world_index.chunk_blocks(position)  # This chunk's part of the world index
         self.generated = False
+        self.loaded = False  # All block entities created
         self.entity = Entity(model=None, position=Vec3(0, 0, 0))  # Parent entity for the chunk
 
     def generate(self):
         if self.generated:
             return
 
-        chunk_x, chunk_z = self.position
-        world_x_start = chunk_x * CHUNK_SIZE
-        world_z_start = chunk_z * CHUNK_SIZE
-
-        # Generate terrain for this chunk using Perlin noise
-        for x in range(CHUNK_SIZE):
-            for z in range(CHUNK_SIZE):
-                # Calculate absolute world position
-                world_x = world_x_start + x
-                world_z = world_z_start + z
-
-                # Use Perlin noise for height
-                height = get_height(world_x, world_z)
-
-                # Check if this should be a water area
-                is_water = is_water_area(world_x, world_z)
-
-                if is_water:
-                    # Create water block at level 2
-                    water_pos = Vec3(world_x, 2, world_z)
-                    water_local_pos = (x, 2, z)
-
-                    self.blocks[water_local_pos] = {
-                        'position': water_pos,
-                        'type': 'WATER',
-                        'entity': None
-                    }
-
-                    # Create sand under water
-                    sand_pos = Vec3(world_x, 1, world_z)
-                    sand_local_pos = (x, 1, z)
-
-                    self.blocks[sand_local_pos] = {
-                        'position': sand_pos,
-                        'type': 'SAND',
-                        'entity': None
-                    }
-                else:
-                    # Create top block
-                    block_type = 'GRASS'
-                    # Sometimes add sand patches
-                    if height <= 2 and terrain_noise([world_x / 15, world_z / 15]) > 0.3:
-                        block_type = 'SAND'
-
-                    world_pos = Vec3(world_x, height, world_z)
-                    local_pos = (x, height, z)
-
-                    # Store block in chunk's local dictionary
-                    self.blocks[local_pos] = {
-                        'position': world_pos,
-                        'type': block_type,
-                        'entity': None
-                    }
-
-                    # Create dirt blocks below surface
-                    for y in range(max(0, height - 1), max(0, height - 3), -1):
-                        dirt_pos = Vec3(world_x, y, world_z)
-                        dirt_local_pos = (x, y, z)
-
-                        self.blocks[dirt_local_pos] = {
-                            'position': dirt_pos,
-                            'type': 'DIRT',
-                            'entity': None
-                        }
-
-                    # Stone at bottom layers
-                    for y in range(max(0, height - 3), 1, -1):
-                        stone_pos = Vec3(world_x, y, world_z)
-                        stone_local_pos = (x, y, z)
-
-                        self.blocks[stone_local_pos] = {
-                            'position': stone_pos,
-                            'type': 'STONE',
-                            'entity': None
-                        }
-
-                    # Occasionally add trees or wood blocks (simplified)
-                    tree_value = tree_noise([world_x / 20, world_z / 20])
-                    if block_type == 'GRASS' and tree_value > 0.6 and random.random() > 0.8:
-                        # Add a simple tree trunk (just a column of wood blocks)
-                        tree_height = random.randint(3, 5)
-                        for y in range(1, tree_height + 1):
-                            wood_pos = Vec3(world_x, height + y, world_z)
-                            wood_local_pos = (x, height + y, z)
-
-                            self.blocks[wood_local_pos] = {
-                                'position': wood_pos,
-                                'type': 'WOOD',
-                                'entity': None
-                            }
-
-                # Add bedrock at y=0 (unbreakable bottom layer)
-                bedrock_pos = Vec3(world_x, 0, world_z)
-                bedrock_local_pos = (x, 0, z)
-
-                self.blocks[bedrock_local_pos] = {
-                    'position': bedrock_pos,
-                    'type': 'BEDROCK',
-                    'entity': None
-                }
+        self.set_blocks(generate_chunk_blocks(self.position))
+
+    def set_blocks(self, block_types):
+        """Fill the chunk from {local index: block_type}, e.g. generated locally or sent by a world server"""
+        for key, block_type in block_types.items():
+            self.blocks[key] = {
+                'type': block_type,
+                'entity': None
+            }
 
         self.generated = True
 
     def load(self):
         """Create actual block entities for this chunk"""
         if not self.generated:
+            if world_client:
+                return False  # Still waiting for the world server to send this chunk
             self.generate()
 
         # Performance optimization: limit blocks created per frame
         blocks_created = 0
 
-        for local_pos, block_data in self.blocks.items():
+        for key, block_data in self.blocks.items():
             if block_data['entity'] is None:
                 if blocks_created >= MAX_BLOCKS_PER_FRAME:
                     # Limit reached, will continue loading in next frame
                     return False
 
-                world_pos = block_data['position']
+                world_pos = Vec3(*world_index.world_position(self.position, key))
                 block_type = block_data['type']
 
                 # Create block entity
-                block = Block(position=world_pos, block_type=block_type, parent=self.entity)
-                block_data['entity'] = block
-
-                # Store in active blocks dictionary
-                active_blocks[tuple(world_pos)] = block
+                block_data['entity'] = Block(position=world_pos, block_type=block_type, parent=self.entity)
 
                 blocks_created += 1
 
+        if not self.loaded:
+            self.loaded = True
+            chunk_stats['loaded'] += 1
         return True  # All blocks loaded
 
     def unload(self):
         """Remove all block entities from this chunk to free memory"""
-        for local_pos, block_data in self.blocks.items():
-            if block_data['entity'] is not None:
-                # Remove from active blocks dictionary
-                world_pos = block_data['position']
-                if tuple(world_pos) in active_blocks:
-                    del active_blocks[tuple(world_pos)]
+        if self.loaded:
+            self.loaded = False
+            chunk_stats['unloaded'] += 1
 
-                # Destroy entity
+        for block_data in self.blocks.values():
+            if block_data['entity'] is not None:
                 destroy(block_data['entity'])
                 block_data['entity'] = None
 
+    def local_key(self, position):
+        """Packed local index of a world position, or None if it is outside this chunk"""
+        chunk_pos, key = world_index.locate(position)
+        return key if chunk_pos == self.position else None
+
     def is_position_in_chunk(self, position):
         """Check if a world position is within this chunk"""
-        chunk_x, chunk_z = self.position
-        world_x_start = chunk_x * CHUNK_SIZE
-        world_z_start = chunk_z * CHUNK_SIZE
-
-        return (world_x_start <= position.x < world_x_start + CHUNK_SIZE and
-                world_z_start <= position.z < world_z_start + CHUNK_SIZE)
+        return self.local_key(position) is not None
 
     def get_block_at(self, position):
         """Get block at a world position if it's in this chunk"""
         if not self.is_position_in_chunk(position):
             return None
-
-        # Convert world position to local position
-        chunk_x, chunk_z = self.position
-        world_x_start = chunk_x * CHUNK_SIZE
-        world_z_start = chunk_z * CHUNK_SIZE
-
-        local_x = int(position.x - world_x_start)
-        local_y = int(position.y)
-        local_z = int(position.z - world_z_start)
-
-        local_pos = (local_x, local_y, local_z)
-        return self.blocks.get(local_pos)
+        return world_index.get(*world_coordinates(position))
 
     def add_block(self, position, block_type):
         """Add a block at the specified world position if it's in this chunk"""
-        if not self.is_position_in_chunk(position):
-            return False
-
-        # Convert world position to local position
-        chunk_x, chunk_z = self.position
-        world_x_start = chunk_x * CHUNK_SIZE
-        world_z_start = chunk_z * CHUNK_SIZE
-
-        local_x = int(position.x - world_x_start)
-        local_y = int(position.y)
-        local_z = int(position.z - world_z_start)
-
-        local_pos = (local_x, local_y, local_z)
+        key = self.local_key(position)
 
-        # Check if there's already a block here
-        if local_pos in self.blocks:
+        # Check if it's ours and there's no block here already
+        if key is None or world_index.get(*world_coordinates(position)) is not None:
             return False
 
         # Create block data and entity
-        block = Block(position=position, block_type=block_type, parent=self.entity)
-
-        # Store in chunk's local dictionary
-        self.blocks[local_pos] = {
-            'position': position,
+        block = Block(position=Vec3(*world_coordinates(position)), block_type=block_type, parent=self.entity)
+        self.blocks[key] = {
             'type': block_type,
             'entity': block
         }
-
-        # Store in active blocks dictionary
-        active_blocks[tuple(position)] = block
         return True
 
     def remove_block(self, position):
         """Remove a block at the specified world position if it's in this chunk"""
-        if not self.is_position_in_chunk(position):
-            return False
-
-        # Convert world position to local position
-        chunk_x, chunk_z = self.position
-        world_x_start = chunk_x * CHUNK_SIZE
-        world_z_start = chunk_z * CHUNK_SIZE
-
-        local_x = int(position.x - world_x_start)
-        local_y = int(position.y)
-        local_z = int(position.z - world_z_start)
-
-        local_pos = (local_x, local_y, local_z)
-
         # Check if there's a block here
-        if local_pos not in self.blocks or self.blocks[local_pos]['entity'] is None:
+        block_data = self.get_block_at(position)
+        if block_data is None or block_data['entity'] is None:
             return False
 
-        # Get block data
-        block_data = self.blocks[local_pos]
-
-        # Remove from active blocks dictionary
-        if tuple(position) in active_blocks:
-            del active_blocks[tuple(position)]
-
-        # Destroy entity
+        # Destroy entity and forget the block
         destroy(block_data['entity'])
-        block_data['entity'] = None
-
-        # Remove from blocks dictionary
-        del self.blocks[local_pos]
+        del self.blocks[self.local_key(position)]
         return True
 
 
@@ -623,13 +1118,33 @@ class PauseMenu(Entity):
 chunk_update_timer = 0
 chunks_to_process = []
 loading_text = None
+chunk_stats = {'loaded': 0, 'unloaded': 0}  # Running totals, read by the replay benchmark
+
+# Startup milestones in seconds since launch (None until reached)
+startup_timings = {
+    'spawn_ready': None,  # Spawn chunk generated and fully loaded
+    'first_frame': None,  # First frame handed to the engine
+    'playable': None,  # All chunks around the spawn point loaded
+}
+
+
+def record_startup_milestone(name):
+    """Record a startup milestone once and report it"""
+    if startup_timings[name] is not None:
+        return
+
+    startup_timings[name] = perf_counter() - STARTUP_BEGIN
+    print(f"[startup] {name.replace('_', ' ')}: {startup_timings[name] * 1000:.0f} ms")
+
+    if name == 'playable':
+        print(f"[startup] time-to-first-frame {startup_timings['first_frame'] * 1000:.0f} ms, "
+              f"time-to-playable {startup_timings['playable'] * 1000:.0f} ms")
 
 
 def get_chunk_position(position):
     """Get chunk coordinates from world position"""
-    chunk_x = int(position.x) // CHUNK_SIZE
-    chunk_z = int(position.z) // CHUNK_SIZE
-    return (chunk_x, chunk_z)
+    x, y, z = world_coordinates(position)
+    return x // CHUNK_SIZE, z // CHUNK_SIZE
 
 
 def get_chunk(position):
@@ -638,6 +1153,16 @@ def get_chunk(position):
     return chunks.get(chunk_pos)
 
 
+def create_chunk(chunk_pos):
+    """Create a chunk and generate it, or ask the world server for it when connected to one"""
+    chunks[chunk_pos] = Chunk(chunk_pos)
+    if world_client:
+        world_client.request_chunk(chunk_pos)
+    else:
+        chunks[chunk_pos].generate()
+    return chunks[chunk_pos]
+
+
 def add_block(position, block_type):
     """Add a block at the specified world position"""
     # Get the chunk for this position
@@ -646,12 +1171,18 @@ def add_block(position, block_type):
     # Check if chunk exists
     if chunk_pos not in chunks:
         # Create and generate chunk if it doesn't exist
-        chunks[chunk_pos] = Chunk(chunk_pos)
-        chunks[chunk_pos].generate()
+        create_chunk(chunk_pos)
 
     # Add block to chunk
     chunk = chunks[chunk_pos]
-    return chunk.add_block(position, block_type)
+    if not chunk.generated:
+        return False  # Edits wait until the world server has sent the chunk
+    if not chunk.add_block(position, block_type):
+        return False
+
+    if world_client:
+        world_client.send_edit(*world_coordinates(position), block_type)
+    return True
 
 
 def remove_block(position):
@@ -665,15 +1196,67 @@ def remove_block(position):
 
     # Remove block from chunk
     chunk = chunks[chunk_pos]
-    return chunk.remove_block(position)
+    if not chunk.remove_block(position):
+        return False
+
+    if world_client:
+        world_client.send_edit(*world_coordinates(position), None)
+    return True
+
+
+def apply_remote_block(x, y, z, type_id):
+    """Bring a block in line with the world server (another client's edit, or one of ours it rejected)"""
+    position = Vec3(x, y, z)
+    chunk = get_chunk(position)
+    if chunk is None or not chunk.generated:
+        return  # The chunk the server sends us later already includes the change
 
+    block_type = None if type_id == NO_BLOCK else BLOCK_TYPE_NAMES[type_id]
+    block_data = world_index.get(x, y, z)
+    if block_data is not None:
+        if block_data['type'] == block_type:
+            return
+        if block_data['entity'] is not None:
+            chunk.remove_block(position)
+        else:
+            del chunk.blocks[chunk.local_key(position)]
+
+    if block_type is not None:
+        if chunk.loaded:
+            chunk.add_block(position, block_type)
+        else:
+            chunk.blocks[chunk.local_key(position)] = {'type': block_type, 'entity': None}
 
-def update_chunks():
+
+def process_world_messages():
+    """Apply chunks and block changes that arrived from the world server"""
+    global world_client
+
+    try:
+        frames = world_client.poll()
+    except ConnectionError as error:
+        # Keep playing: chunks still waiting for the server are generated locally from now on
+        print(f"Lost the world server ({error}); generating the world locally", file=sys.stderr)
+        world_client.sock.close()
+        world_client = None
+        return
+
+    for msg_type, payload in frames:
+        if msg_type == MSG_CHUNK:
+            chunk_pos, block_types = decode_chunk(payload)
+            chunk = chunks.get(chunk_pos)
+            if chunk is not None and not chunk.generated:
+                chunk.set_blocks(block_types)
+        elif msg_type in (MSG_EDIT_RESULT, MSG_BLOCK_CHANGED):
+            apply_remote_block(*BLOCK_EDIT.unpack(payload))
+
+
+def update_chunks(dt=None):
     """Update chunks based on player position with performance optimizations"""
     global chunk_update_timer, chunks_to_process, loading_text
 
     # Only update chunks periodically, not every frame
-    chunk_update_timer += time.dt
+    chunk_update_timer += time.dt if dt is None else dt
     if chunk_update_timer < CHUNK_LOAD_INTERVAL and not chunks_to_process:
         return
 
@@ -694,8 +1277,7 @@ def update_chunks():
                 chunk_pos = (x, z)
                 if chunk_pos not in chunks:
                     # Create new chunk
-                    chunks[chunk_pos] = Chunk(chunk_pos)
-                    chunks[chunk_pos].generate()
+                    create_chunk(chunk_pos)
                     chunks_to_process.append(chunk_pos)
                 elif chunks[chunk_pos].generated and any(
                         block_data['entity'] is None for block_data in chunks[chunk_pos].blocks.values()
@@ -725,9 +1307,13 @@ def update_chunks():
         # Process one chunk
         chunk_pos = chunks_to_process[0]
         if chunk_pos in chunks:
-            fully_loaded = chunks[chunk_pos].load()
-            if fully_loaded:
-                chunks_to_process.pop(0)
+            if not chunks[chunk_pos].generated and world_client:
+                # Not received from the world server yet, try the next chunk meanwhile
+                chunks_to_process.append(chunks_to_process.pop(0))
+            else:
+                fully_loaded = chunks[chunk_pos].load()
+                if fully_loaded:
+                    chunks_to_process.pop(0)
         else:
             chunks_to_process.pop(0)
 
@@ -736,6 +1322,12 @@ def update_chunks():
             destroy(loading_text)
             loading_text = None
 
+    # The spawn area has finished streaming in
+    if not chunks_to_process and startup_timings['first_frame'] is not None:
+        if startup_timings['playable'] is None and args.memory_report and not args.replay:
+            print_memory_report(build_memory_report())
+        record_startup_milestone('playable')
+
 
 # Generate world using chunk system
 def generate_initial_chunks():
@@ -743,12 +1335,402 @@ def generate_initial_chunks():
     player_chunk_pos = get_chunk_position(Vec3(0, 0, 0))
     player_chunk_x, player_chunk_z = player_chunk_pos
 
-    for x in range(player_chunk_x - 1, player_chunk_x + 2):
-        for z in range(player_chunk_z - 1, player_chunk_z + 2):
-            chunk_pos = (x, z)
-            chunks[chunk_pos] = Chunk(chunk_pos)
-            chunks[chunk_pos].generate()
-            chunks[chunk_pos].load()
+    if not PROGRESSIVE_STARTUP:
+        for x in range(player_chunk_x - 1, player_chunk_x + 2):
+            for z in range(player_chunk_z - 1, player_chunk_z + 2):
+                chunk_pos = (x, z)
+                create_chunk(chunk_pos)
+                if world_client:
+                    chunks[chunk_pos].set_blocks(world_client.wait_for_chunk(chunk_pos))
+                while not chunks[chunk_pos].load():
+                    pass
+        record_startup_milestone('spawn_ready')
+        return
+
+    # Fully load the chunk the player spawns in so there is ground on the first frame
+    create_chunk(player_chunk_pos)
+    if world_client:
+        chunks[player_chunk_pos].set_blocks(world_client.wait_for_chunk(player_chunk_pos))
+    while not chunks[player_chunk_pos].load():
+        pass
+    record_startup_milestone('spawn_ready')
+
+    # Queue the neighbours, closest first; update_chunks generates and loads them over the next frames
+    neighbours = [
+        (x, z)
+        for x in range(player_chunk_x - 1, player_chunk_x + 2)
+        for z in range(player_chunk_z - 1, player_chunk_z + 2)
+        if (x, z) != player_chunk_pos
+    ]
+    neighbours.sort(key=lambda pos: abs(pos[0] - player_chunk_x) + abs(pos[1] - player_chunk_z))
+    for chunk_pos in neighbours:
+        chunks[chunk_pos] = Chunk(chunk_pos)
+        if world_client:
+            world_client.request_chunk(chunk_pos)
+        chunks_to_process.append(chunk_pos)
+
+
+# Replay benchmark settings
+REPLAY_STEP = 1 / 60  # Simulated seconds per frame, so every run visits the same positions
+REPLAY_WARMUP_FRAMES = 10  # Frames left out of the statistics (shader compilation etc.)
+REPLAY_SPRINT_SPEED = 20  # Blocks per second
+REPLAY_CIRCLE_RADIUS = 40
+REPLAY_CIRCLE_PERIOD = 15  # Seconds per lap
+REPLAY_TELEPORT_INTERVAL = 3  # Seconds between teleports
+PATH_RECORD_INTERVAL = 0.1  # Seconds between recorded samples
+
+
+class FlightPath:
+    """A deterministic player path: position as a function of simulated time"""
+
+    def __init__(self, name, seed, duration):
+        self.name = name
+        self.duration = duration
+        self.samples = None
+        self.teleport_points = []
+
+        if name == 'teleport':
+            rng = random.Random(seed)
+            for _ in range(int(duration // REPLAY_TELEPORT_INTERVAL) + 1):
+                angle = rng.uniform(0, 2 * math.pi)
+                distance = rng.uniform(40, 120)
+                self.teleport_points.append((math.cos(angle) * distance, math.sin(angle) * distance))
+        elif name not in ('sprint', 'circle'):
+            # Recorded path file written by --record-path
+            with open(name) as f:
+                self.samples = json.load(f)['samples']
+            self.sample_times = [sample[0] for sample in self.samples]
+            self.duration = min(duration, self.samples[-1][0])
+
+    def position_at(self, t):
+        if self.samples is not None:
+            i = bisect.bisect_right(self.sample_times, t)
+            if i >= len(self.samples):
+                return Vec3(*self.samples[-1][1:])
+            t0, x0, y0, z0 = self.samples[i - 1] if i else self.samples[0]
+            t1, x1, y1, z1 = self.samples[i]
+            k = (t - t0) / (t1 - t0) if t1 > t0 else 0
+            return Vec3(x0 + (x1 - x0) * k, y0 + (y1 - y0) * k, z0 + (z1 - z0) * k)
+
+        if self.name == 'sprint':
+            x, z = t * REPLAY_SPRINT_SPEED, 0.5
+        elif self.name == 'circle':
+            angle = 2 * math.pi * t / REPLAY_CIRCLE_PERIOD
+            x, z = math.cos(angle) * REPLAY_CIRCLE_RADIUS, math.sin(angle) * REPLAY_CIRCLE_RADIUS
+        else:
+            x, z = self.teleport_points[min(int(t // REPLAY_TELEPORT_INTERVAL), len(self.teleport_points) - 1)]
+
+        # Fly just above the terrain
+        return Vec3(x, get_height(int(x), int(z)) + 2, z)
+
+
+class ReplayBenchmark:
+    """Drives the player along a FlightPath and records per-frame streaming statistics"""
+
+    def __init__(self, path, seed):
+        self.path = path
+        self.seed = seed
+        self.sim_time = 0
+        self.frames = []
+        self.last_frame = None
+        self.wall_start = None
+        self.finished = False
+
+    def step(self):
+        now = perf_counter()
+        if self.last_frame is None:
+            self.wall_start = now
+        frame_ms = 0 if self.last_frame is None else (now - self.last_frame) * 1000
+        self.last_frame = now
+
+        loaded, unloaded = chunk_stats['loaded'], chunk_stats['unloaded']
+
+        player.position = self.path.position_at(self.sim_time)
+        update_chunks(dt=REPLAY_STEP)
+
+        self.frames.append({
+            't': round(self.sim_time, 4),
+            'frame_ms': round(frame_ms, 3),
+            'loaded': chunk_stats['loaded'] - loaded,
+            'unloaded': chunk_stats['unloaded'] - unloaded,
+            'queue': len(chunks_to_process),
+        })
+
+        self.sim_time += REPLAY_STEP
+        if self.sim_time > self.path.duration:
+            self.finish()
+
+    def summary(self):
+        measured = self.frames[REPLAY_WARMUP_FRAMES:] or self.frames
+        times = sorted(frame['frame_ms'] for frame in measured)
+
+        def percentile(p):
+            return times[min(len(times) - 1, int(len(times) * p))]
+
+        return {
+            'path': self.path.name,
+            'seed': self.seed,
+            'frames': len(measured),
+            'sim_seconds': round(self.sim_time, 2),
+            'wall_seconds': round(self.last_frame - self.wall_start, 2),
+            'mean_ms': round(sum(times) / len(times), 2),
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+            'p99_ms': percentile(0.99),
+            'max_ms': times[-1],
+            'over_16ms': sum(1 for t in times if t > 1000 / 60),
+            'over_33ms': sum(1 for t in times if t > 1000 / 30),
+            'chunks_loaded': sum(frame['loaded'] for frame in self.frames),
+            'chunks_unloaded': sum(frame['unloaded'] for frame in self.frames),
+            'max_queue': max(frame['queue'] for frame in self.frames),
+        }
+
+    def print_report(self, summary):
+        print(f"\n=== Replay '{summary['path']}' (seed {summary['seed']}) ===")
+        print(f"{summary['frames']} frames, {summary['sim_seconds']} s simulated, {summary['wall_seconds']} s wall")
+        print(f"frame time ms: mean {summary['mean_ms']}  p50 {summary['p50_ms']}  p95 {summary['p95_ms']}  "
+              f"p99 {summary['p99_ms']}  max {summary['max_ms']}")
+        print(f"frames over 16 ms: {summary['over_16ms']} ({summary['over_16ms'] / summary['frames']:.1%})  "
+              f"over 33 ms: {summary['over_33ms']} ({summary['over_33ms'] / summary['frames']:.1%})")
+        print(f"chunks loaded {summary['chunks_loaded']}, unloaded {summary['chunks_unloaded']}, "
+              f"max queue depth {summary['max_queue']}")
+
+        print("worst spikes:")
+        measured = self.frames[REPLAY_WARMUP_FRAMES:] or self.frames
+        for frame in sorted(measured, key=lambda f: f['frame_ms'], reverse=True)[:5]:
+            print(f"  {frame['frame_ms']:7.1f} ms at t={frame['t']:.2f} s  "
+                  f"(queue {frame['queue']}, +{frame['loaded']} / -{frame['unloaded']} chunks)")
+
+    def print_comparison(self, summary, baseline_file):
+        with open(baseline_file) as f:
+            baseline = json.load(f)['summary']
+
+        print(f"\n=== Compared with {baseline_file} ===")
+        for key in ('mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms', 'over_16ms', 'over_33ms', 'max_queue'):
+            before, after = baseline[key], summary[key]
+            print(f"  {key:10} {before:10} -> {after:<10} ({after - before:+.2f})")
+        if (baseline['path'], baseline['seed']) != (summary['path'], summary['seed']):
+            print("  warning: baseline used a different path or seed")
+
+    def finish(self):
+        if self.finished:
+            return
+        self.finished = True
+
+        summary = self.summary()
+        self.print_report(summary)
+        if args.replay_compare:
+            self.print_comparison(summary, args.replay_compare)
+        if args.replay_out:
+            with open(args.replay_out, 'w') as f:
+                json.dump({'summary': summary, 'frames': self.frames}, f, indent=1)
+            print(f"Replay log written to {args.replay_out}")
+        if args.memory_report:
+            print_memory_report(build_memory_report())
+
+        application.quit()
+
+
+class PathRecorder:
+    """Samples the player's position during normal play and saves it for --replay"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.samples = []
+        self.start = perf_counter()
+        self.last_sample = None
+        atexit.register(self.save)
+
+    def sample(self):
+        now = perf_counter() - self.start
+        if self.last_sample is not None and now - self.last_sample < PATH_RECORD_INTERVAL:
+            return
+        self.last_sample = now
+        self.samples.append([round(now, 3), round(player.x, 3), round(player.y, 3), round(player.z, 3)])
+
+    def save(self):
+        if not self.samples:
+            return
+        with open(self.filename, 'w') as f:
+            json.dump({'samples': self.samples}, f)
+        print(f"Recorded {len(self.samples)} path samples to {self.filename}")
+
+
+# Memory report settings
+MEMORY_REPORT_KEY = 'f9'
+MEMORY_OUTLIER_FACTOR = 3  # Flag chunks this many median deviations above the median chunk
+
+
+def deep_size(obj, seen=None):
+    """Estimate the Python heap size of obj and the containers/values it holds"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += deep_size(key, seen) + deep_size(value, seen)
+    elif isinstance(obj, (list, tuple, set)):
+        for item in obj:
+            size += deep_size(item, seen)
+    return size
+
+
+def entity_size(entity, seen):
+    """Python-side size of an entity (native Panda3D allocations are not visible here)"""
+    if id(entity) in seen:
+        return 0
+    seen.update((id(entity), id(entity.__dict__)))
+    size = sys.getsizeof(entity) + sys.getsizeof(entity.__dict__)
+    for value in entity.__dict__.values():
+        if isinstance(value, (str, int, float, tuple, list, dict)):
+            size += deep_size(value, seen)
+    return size
+
+
+def model_size(model):
+    """Vertex and index data size of a loaded model, in bytes"""
+    size = 0
+    try:
+        for geom_node in model.findAllMatches('**/+GeomNode'):
+            node = geom_node.node()
+            for i in range(node.getNumGeoms()):
+                geom = node.getGeom(i)
+                vertex_data = geom.getVertexData()
+                for j in range(vertex_data.getNumArrays()):
+                    size += vertex_data.getArray(j).getDataSizeBytes()
+                for j in range(geom.getNumPrimitives()):
+                    vertices = geom.getPrimitive(j).getVertices()
+                    if vertices is not None:
+                        size += vertices.getDataSizeBytes()
+    except Exception:
+        # Procedural or unusual models: fall back to nothing rather than break the report
+        pass
+    return size
+
+
+def build_memory_report():
+    """Break memory down by subsystem and per chunk"""
+    seen = set()
+    per_chunk = []
+    models = {}
+
+    for chunk_pos, chunk in chunks.items():
+        entity_bytes = 0
+        entity_count = 0
+        for block_data in chunk.blocks.values():
+            entity = block_data['entity']
+            if entity is not None:
+                entity_count += 1
+                entity_bytes += entity_size(entity, seen)
+                if entity.model is not None and entity.model.name not in models:
+                    models[entity.model.name] = model_size(entity.model)
+        # Entities are already counted above, so the shared seen set keeps them out of the voxel data
+        voxel_bytes = deep_size(chunk.blocks, seen)
+        per_chunk.append({
+            'chunk': chunk_pos,
+            'blocks': len(chunk.blocks),
+            'entities': entity_count,
+            'voxel_bytes': voxel_bytes,
+            'entity_bytes': entity_bytes,
+            'total_bytes': voxel_bytes + entity_bytes,
+        })
+
+    # Flag chunks far above the typical chunk (median absolute deviation, robust to the outliers themselves).
+    # Loaded and unloaded chunks are compared separately, since entities dominate a loaded chunk.
+    median = 0
+    for loaded in (True, False):
+        group = [entry for entry in per_chunk if (entry['entities'] > 0) == loaded]
+        if not group:
+            continue
+        totals = sorted(entry['total_bytes'] for entry in group)
+        group_median = totals[len(totals) // 2]
+        deviations = sorted(abs(total - group_median) for total in totals)
+        mad = deviations[len(deviations) // 2] or 1
+        for entry in group:
+            entry['outlier'] = (entry['total_bytes'] > group_median + MEMORY_OUTLIER_FACTOR * mad and
+                                entry['total_bytes'] > group_median * 1.5)
+        if loaded or not median:
+            median = group_median
+
+    report = {
+        'subsystems': {
+            'voxel data': sum(entry['voxel_bytes'] for entry in per_chunk),
+            'entities': sum(entry['entity_bytes'] for entry in per_chunk),
+            'meshes': sum(models.values()),
+            'caches': deep_size(chunks_to_process, seen) + sys.getsizeof(chunks) + sys.getsizeof(world_index.chunks),
+        },
+        'entity_count': sum(entry['entities'] for entry in per_chunk),
+        'model_count': len(models),
+        'median_chunk_bytes': median,
+        'chunks': per_chunk,
+        'traced': None,
+    }
+
+    if tracemalloc.is_tracing():
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        report['traced'] = {
+            'current': current,
+            'peak': peak,
+            'top': [(str(stat.traceback), stat.size) for stat in snapshot.statistics('filename')[:5]],
+            'growth': [],
+        }
+        if memory_snapshots:
+            growth = snapshot.compare_to(memory_snapshots[-1], 'filename')[:5]
+            report['traced']['growth'] = [(str(stat.traceback), stat.size_diff) for stat in growth]
+        memory_snapshots[:] = [snapshot]
+
+    return report
+
+
+def print_memory_report(report):
+    kb = lambda n: f"{n / 1024:,.1f} KB"
+
+    print("\n=== Memory report ===")
+    for name, size in report['subsystems'].items():
+        print(f"  {name:12} {kb(size):>12}")
+    print(f"  ({report['entity_count']} block entities sharing {report['model_count']} meshes; "
+          f"entity sizes are Python-side only)")
+
+    print(f"Per chunk (median loaded chunk {kb(report['median_chunk_bytes'])}):")
+    for entry in sorted(report['chunks'], key=lambda e: e['total_bytes'], reverse=True):
+        flag = "  <-- outlier" if entry['outlier'] else ""
+        print(f"  {str(entry['chunk']):12} {entry['blocks']:5} blocks {entry['entities']:5} entities "
+              f"{kb(entry['total_bytes']):>12}{flag}")
+
+    traced = report['traced']
+    if traced is None:
+        print("Allocation tracing started; the next report will include traced totals and growth.")
+        return
+
+    print(f"Traced Python allocations: {kb(traced['current'])} (peak {kb(traced['peak'])})")
+    for where, size in traced['top']:
+        print(f"  {kb(size):>12}  {where}")
+    if traced['growth']:
+        print("Growth since the previous report:")
+        for where, diff in traced['growth']:
+            print(f"  {'+' if diff >= 0 else '-'}{kb(abs(diff)):>11}  {where}")
+
+
+def show_memory_report():
+    """Print the full report to the console and a short summary on screen"""
+    report = build_memory_report()
+    print_memory_report(report)
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+    summary = "\n".join(f"{name}: {size / 1024:,.0f} KB" for name, size in report['subsystems'].items())
+    outliers = sum(1 for entry in report['chunks'] if entry['outlier'])
+    if outliers:
+        summary += f"\n{outliers} chunk(s) out of line, see console"
+    destroy(Text(text=summary, position=(-0.85, 0.4), scale=1, color=color.white), delay=5)
+
+
+memory_snapshots = []  # Last tracemalloc snapshot, to report growth between reports
 
 
 # Create player
@@ -758,9 +1740,21 @@ camera.fov = 70
 # Create pause menu
 pause_menu = PauseMenu()
 
+# Get the world from a separate world server process if requested
+world_client = connect_to_world_server(args.connect) if args.connect else None
+
 # Generate initial chunks
 generate_initial_chunks()
 
+# Benchmark replay or path recording, if requested
+replay = None
+path_recorder = None
+if args.replay:
+    replay = ReplayBenchmark(FlightPath(args.replay, args.seed, args.replay_duration), args.seed)
+    player.ignore_input = True  # The path drives the player, not gravity or the keyboard
+elif args.record_path:
+    path_recorder = PathRecorder(args.record_path)
+
 # Create a stronger crosshair for better visibility
 crosshair = Entity(
     parent=camera.ui,
@@ -779,7 +1773,14 @@ fps_counter = Text(
 )
 
 
+def input(key):
+    if key == MEMORY_REPORT_KEY:
+        show_memory_report()
+
+
 def update():
+    record_startup_milestone('first_frame')
+
     # Update FPS counter
     if time.dt > 0:  # Avoid division by zero
         fps_counter.text = f"FPS: {round(1 / time.dt)}"
@@ -792,6 +1793,16 @@ def update():
         if hasattr(pause_menu, 'escape_pressed_global'):
             delattr(pause_menu, 'escape_pressed_global')
 
+    if world_client:
+        process_world_messages()
+
+    if replay:
+        replay.step()
+        return
+
+    if path_recorder:
+        path_recorder.sample()
+
     # Update chunks if not paused
     if not pause_menu.enabled:
         update_chunks()
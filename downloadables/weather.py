@@ -4,31 +4,154 @@ Weather Dashboard TUI Application
 A terminal-based weather app with location selection and emoji visualizations.
 There is no need to abuse my API, please dont use it in your own projects, create your own free API over at: weatherapi.com
 i am using the free plan so there is no need to steal my API key :D
-NEEDED PYTHON PACKAGES: requests, rich, textual, and curses-windows if your on windows.
+NEEDED PYTHON PACKAGES: requests, rich and textual.
 """
-import curses
 import time
+STARTUP_BEGIN = time.perf_counter()  # Startup timings are measured from here
 import json
 import sys
 import os
+import hashlib
+import tempfile
+import shutil
+import atexit
+import threading
+import random
+import itertools
+import heapq
+import math
+from contextlib import contextmanager
+import mmap
+import struct
+import csv
+import unicodedata
+import sqlite3
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta
-import requests
+from urllib.parse import urlparse, parse_qs
 import argparse
-from rich.console import Console
+# requests (and urllib3) are imported on the first network request and http.server only
+# for the stand-in API: a warm start from the cache paints without waiting for them
+from rich.console import Group
 from rich.panel import Panel
-from rich.layout import Layout
 from rich.text import Text
 from rich.table import Table
 from rich import box
-from rich.live import Live
-from rich.columns import Columns
+from textual import work
 from textual.app import App, ComposeResult
-from textual.widgets import Header, Footer, Input, Button, Static
+from textual.widgets import Header, Footer, Input, Button, Static, OptionList
 from textual.containers import Container
+from textual.scroll_view import ScrollView
+from textual.strip import Strip
+from textual.geometry import Size
+from rich.segment import Segment
+from rich.style import Style
+from rich.cells import set_cell_size
 from textual.reactive import reactive
-from textual.screen import ModalScreen, Screen
-from textual.binding import Binding
+from textual.screen import ModalScreen
 from textual.message import Message
+from textual.worker import get_current_worker
+
+startup_timings = {}  # Milestone -> seconds since STARTUP_BEGIN
+
+def record_startup_milestone(name):
+    """Note the first time a startup milestone is reached"""
+    if name not in startup_timings:
+        startup_timings[name] = time.perf_counter() - STARTUP_BEGIN
+
+record_startup_milestone("imports")
+
+# Latency spans: fetch, decode, model building and panel building are timed into histograms
+HISTOGRAM_BASE = 1e-5  # Seconds; the first bucket holds everything up to 10 µs
+HISTOGRAM_STEPS = 4  # Buckets per doubling, so a bucket bound is at most ~19% above its values
+
+class LatencyHistogram:
+    """Log-bucketed histogram of durations in seconds"""
+    
+    def __init__(self):
+        self.buckets = {}  # Bucket index -> count
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+    
+    def add(self, seconds):
+        index = 0 if seconds <= HISTOGRAM_BASE else math.ceil(math.log2(seconds / HISTOGRAM_BASE) * HISTOGRAM_STEPS)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+    
+    @staticmethod
+    def bound(index):
+        """Upper bound, in seconds, of a bucket"""
+        return HISTOGRAM_BASE * 2 ** (index / HISTOGRAM_STEPS)
+    
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of samples, capped at the real max"""
+        if not self.count:
+            return 0.0
+        wanted = fraction * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= wanted:
+                return min(self.bound(index), self.max)
+        return self.max
+    
+    def summary(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "min": self.min or 0.0,
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "p99": self.percentile(0.99),
+            "max": self.max or 0.0,
+            "buckets": {f"{self.bound(index):.6f}": self.buckets[index] for index in sorted(self.buckets)},
+        }
+
+class LatencyRecorder:
+    """Named latency histograms, shared by the worker threads and the event loop"""
+    
+    def __init__(self):
+        self.histograms = {}
+        self._lock = threading.Lock()
+    
+    def add(self, name, seconds):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram()
+            histogram.add(seconds)
+    
+    @contextmanager
+    def span(self, name):
+        """Time the body of a with block into the named histogram"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+    
+    def snapshot(self):
+        with self._lock:
+            return {name: self.histograms[name].summary() for name in sorted(self.histograms)}
+    
+    def export(self, path):
+        """Write every histogram, plus the startup milestones, as JSON for comparing runs"""
+        report = {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "startup": dict(startup_timings),
+            "spans": self.snapshot(),
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+latency = LatencyRecorder()
 
 # Weather condition emoji mappings
 WEATHER_EMOJIS = {
@@ -63,33 +186,1246 @@ def get_emoji_for_condition(condition_text):
     except (AttributeError, TypeError):
         return "🌡️"  # Default emoji if there's an error
 
-def get_weather_data(location):
-    """Get weather data for a location using a real weather API"""
-    try:
-        # Replace this with your actual API key if you have one
-        # Free API keys are available from weatherapi.com
-        API_KEY = "9a12a34432c04023a8005457252903"  # Example key, may not work
+# Parsed weather model: the API response is walked once, when it arrives, and every
+# string the widgets show is formatted up front. Temperatures are kept as (°C, °F) pairs.
+
+def unit_pair(celsius, fahrenheit):
+    return (f"{celsius}°C", f"{fahrenheit}°F")
+
+def pick_unit(pair, use_celsius):
+    """Choose the °C or °F string from a unit pair"""
+    return pair[0] if use_celsius else pair[1]
+
+class CurrentConditions:
+    __slots__ = ("condition", "emoji", "temp", "feels_like", "humidity", "wind", "pressure", "uv")
+    
+    def __init__(self, current, emojis):
+        self.condition = current["condition"]["text"]
+        self.emoji = emojis(self.condition)
+        self.temp = unit_pair(current["temp_c"], current["temp_f"])
+        self.feels_like = unit_pair(current["feelslike_c"], current["feelslike_f"])
+        self.humidity = f"{current['humidity']}%"
+        self.wind = f"{current['wind_kph']} km/h {current['wind_dir']}"
+        self.pressure = f"{current['pressure_mb']} mb"
+        self.uv = str(current["uv"])
+
+class DayForecast:
+    __slots__ = ("date", "condition", "emoji", "high", "low", "rain")
+    
+    def __init__(self, day, emojis):
+        summary = day["day"]
+        self.date = datetime.strptime(day["date"], "%Y-%m-%d").strftime("%a, %b %d")
+        self.condition = summary["condition"]["text"]
+        self.emoji = emojis(self.condition)
+        self.high = unit_pair(summary["maxtemp_c"], summary["maxtemp_f"])
+        self.low = unit_pair(summary["mintemp_c"], summary["mintemp_f"])
+        self.rain = f"{summary['daily_chance_of_rain']}%"
+
+class HourForecast:
+    __slots__ = ("day", "time", "condition", "emoji", "temp", "feels_like", "rain", "wind")
+    
+    def __init__(self, hour, emojis, day=""):
+        self.day = day
+        # "YYYY-MM-DD HH:MM"; keep the whole string if the format is unexpected
+        self.time = hour["time"].split(" ")[1] if " " in hour["time"] else hour["time"]
+        self.condition = hour["condition"]["text"]
+        self.emoji = emojis(self.condition)
+        self.temp = unit_pair(hour["temp_c"], hour["temp_f"])
+        self.feels_like = unit_pair(hour.get("feelslike_c", "?"), hour.get("feelslike_f", "?"))
+        self.rain = f"{hour.get('chance_of_rain', 0)}%"
+        self.wind = f"{hour.get('wind_kph', '?')} km/h {hour.get('wind_dir', '')}".rstrip()
+
+_report_versions = itertools.count(1)
+
+class WeatherReport:
+    """Everything the widgets show for one location, parsed once from an API response"""
+    __slots__ = ("version", "fetched_at", "location_key", "name", "country", "display_name", "localtime", "current", "days", "hours", "all_hours")
+    
+    def __init__(self, data, fetched_at=None, location_key=None):
+        self.version = next(_report_versions)  # Identifies this data in the panel cache
+        self.fetched_at = fetched_at or time.time()  # When the API produced this data
+        # Normalized query the data was fetched (and its history recorded) under
+        self.location_key = location_key
+
+        # Conditions repeat a lot across days and hours, so each one is matched to an emoji once
+        emoji_memo = {}
+        def emojis(condition):
+            if condition not in emoji_memo:
+                emoji_memo[condition] = get_emoji_for_condition(condition)
+            return emoji_memo[condition]
+        
+        try:
+            location = data["location"]
+            self.name = location["name"]
+            self.country = location.get("country") or ""
+            self.display_name = ", ".join(
+                part for part in (location["name"], location.get("region"), location.get("country"))
+                if part and part.strip()
+            )
+            self.localtime = location["localtime"]
+            self.current = CurrentConditions(data["current"], emojis)
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Unexpected API response: missing {str(e)}")
+        
+        forecast_days = data.get("forecast", {}).get("forecastday", [])
+        days = []
+        for day in forecast_days:
+            try:
+                days.append(DayForecast(day, emojis))
+            except (KeyError, ValueError):
+                continue  # Skip problematic days
+        self.days = tuple(days)
+        
+        # Every hour of every day, for the extended forecast; self.hours is just the first day
+        all_hours = []
+        first_day_hours = 0
+        for number, day in enumerate(forecast_days):
+            try:
+                label = datetime.strptime(day["date"], "%Y-%m-%d").strftime("%a %d")
+            except (KeyError, ValueError):
+                label = ""
+            for hour in day.get("hour", []):
+                try:
+                    all_hours.append(HourForecast(hour, emojis, label))
+                except (KeyError, IndexError):
+                    continue  # Skip problematic entries
+            if number == 0:
+                first_day_hours = len(all_hours)
+        self.all_hours = tuple(all_hours)
+        self.hours = self.all_hours[:first_day_hours]
+
+# Response cache settings
+CACHE_DIR = os.environ.get("WEATHER_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "pyos-weather")
+CURRENT_TTL = 10 * 60  # Seconds before current conditions are fetched again
+FORECAST_TTL = 60 * 60  # Seconds before a forecast is fetched again
+CACHE_MAX_ENTRIES = 200  # Locations kept on disk
+CACHE_MAX_BYTES = 20 * 1024 * 1024  # Disk space the cache may use
+
+
+def normalize_location(location):
+    """Normalize a location query so equivalent spellings share a cache entry"""
+    text = " ".join(location.split()).lower()
+    parts = [part.strip() for part in text.split(",")]
+
+    # "40.71280, -74.0060" and "40.7128,-74.006" are the same place (2 decimals is about 1 km)
+    if len(parts) == 2:
+        try:
+            lat, lon = float(parts[0]), float(parts[1])
+            return f"{round(lat, 2) + 0.0:.2f},{round(lon, 2) + 0.0:.2f}"
+        except ValueError:
+            pass
+
+    return ",".join(part for part in parts if part)
+
+class ResponseCache:
+    """On-disk cache of API responses keyed by normalized location, with an in-memory front"""
+    
+    def __init__(self, directory=CACHE_DIR, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.enabled = True
+        self._memory = OrderedDict()  # key -> (fetched_at, data), most recently used last
+        self._lock = threading.Lock()
+    
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+    
+    def get_entry(self, key):
+        """Return (fetched_at, data) for a key regardless of age, or None"""
+        if not self.enabled:
+            return None
+        
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            result = (entry["fetched_at"], entry["data"])
+        except (OSError, ValueError, KeyError):
+            return None
+        
+        self._remember(key, result)
+        return result
+    
+    def get(self, key, max_age):
+        """Return cached data if it is younger than max_age seconds, else None"""
+        entry = self.get_entry(key)
+        if entry is None or time.time() - entry[0] > max_age:
+            return None
+        return entry[1]
+    
+    def put(self, key, data):
+        """Store a response; the file is replaced atomically so readers never see half a write"""
+        if not self.enabled:
+            return
+        
+        entry = (time.time(), data)
+        self._remember(key, entry)
+        
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"key": key, "fetched_at": entry[0], "data": data}, f)
+            os.replace(tmp_path, self._path(key))
+            self._evict()
+        except OSError as e:
+            # A read-only or full disk only costs us the cache, not the weather
+            print(f"Could not write weather cache: {str(e)}", file=sys.stderr)
+    
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+    
+    def _evict(self):
+        """Drop the least recently written entries once the cache is over its limits"""
+        entries = []
+        for item in os.scandir(self.directory):
+            if item.name.endswith(".json"):
+                try:
+                    stat = item.stat()
+                except OSError:
+                    continue  # Evicted by a concurrent writer
+                entries.append((stat.st_mtime, stat.st_size, item.path))
+        
+        total = sum(size for _, size, _ in entries)
+        entries.sort()
+        while entries and (len(entries) > self.max_entries or total > self.max_bytes):
+            _, size, path = entries.pop(0)
+            total -= size
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+response_cache = ResponseCache()
+
+# History: every fetched observation is kept for trend sparklines
+HISTORY_FILE = os.environ.get("WEATHER_HISTORY") or os.path.join(CACHE_DIR, "history.sqlite3")
+
+class HistoryStore:
+    """Append-only SQLite log of observations, one row per location and observation time
+    
+    The table is clustered on (location, observed_at), so a range query for one location
+    reads a single contiguous run of the index no matter how much history there is.
+    """
+    
+    def __init__(self, path=HISTORY_FILE):
+        self.path = path
+        self.enabled = True
+        self._db = None
+        self._lock = threading.Lock()
+    
+    def _connect(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS observations (
+                    location TEXT NOT NULL,
+                    observed_at INTEGER NOT NULL,
+                    temp_c REAL,
+                    precip_mm REAL,
+                    humidity INTEGER,
+                    wind_kph REAL,
+                    PRIMARY KEY (location, observed_at)
+                ) WITHOUT ROWID
+            """)
+        return self._db
+    
+    def record(self, location, data, fetched_at):
+        """Store the current conditions of a response; an observation already stored is skipped"""
+        if not self.enabled:
+            return
+        current = data.get("current") or {}
+        observed_at = int(current.get("last_updated_epoch") or fetched_at)
+        try:
+            with self._lock:
+                db = self._connect()
+                with db:
+                    db.execute(
+                        "INSERT OR IGNORE INTO observations VALUES (?, ?, ?, ?, ?, ?)",
+                        (normalize_location(location), observed_at, current.get("temp_c"),
+                         current.get("precip_mm"), current.get("humidity"), current.get("wind_kph"))
+                    )
+        except (sqlite3.Error, OSError) as e:
+            print(f"Could not record weather history: {str(e)}", file=sys.stderr)
+    
+    def series(self, location, since, until, buckets):
+        """Average temperature and peak precipitation for each of `buckets` equal slices of [since, until)
         
-        # Make a real API request
-        url = f"https://api.weatherapi.com/v1/forecast.json?key={API_KEY}&q={location}&days=5&aqi=no&alerts=no"
+        Slices without observations are None.
+        """
+        temps = [None] * buckets
+        precip = [None] * buckets
+        since, until = int(since), int(until)  # Keeps the bucket arithmetic in integers
+        if not self.enabled or buckets <= 0 or until <= since:
+            return temps, precip
+        try:
+            with self._lock:
+                rows = self._connect().execute(
+                    """
+                    SELECT (observed_at - ?) * ? / ? AS bucket, AVG(temp_c), MAX(precip_mm)
+                    FROM observations
+                    WHERE location = ? AND observed_at >= ? AND observed_at < ?
+                    GROUP BY bucket
+                    """,
+                    (since, buckets, until - since, normalize_location(location), since, until)
+                ).fetchall()
+        except (sqlite3.Error, OSError):
+            return temps, precip
+        for bucket, temp, rain in rows:
+            temps[bucket] = temp
+            precip[bucket] = rain
+        return temps, precip
+    
+    def count(self, location):
+        if not self.enabled:
+            return 0
+        try:
+            with self._lock:
+                return self._connect().execute(
+                    "SELECT COUNT(*) FROM observations WHERE location = ?", (normalize_location(location),)
+                ).fetchone()[0]
+        except (sqlite3.Error, OSError):
+            return 0
+
+history = HistoryStore()
+
+# API client settings
+# Replace this with your actual API key if you have one
+# Free API keys are available from weatherapi.com
+API_KEY = "9a12a34432c04023a8005457252903"  # Example key, may not work
+# Point this (or --api-url) at a local stand-in, see --serve and --replay below
+API_BASE_URL = os.environ.get("WEATHER_API_URL") or "https://api.weatherapi.com/v1"
+FORECAST_DAYS = 5  # Days asked for (--days); the extended forecast asks for EXTENDED_DAYS
+DEFAULT_FORECAST_DAYS = FORECAST_DAYS
+EXTENDED_DAYS = 14  # The most weatherapi.com returns
+REQUEST_TIMEOUT = 10  # Seconds
+MAX_RETRIES = 3  # Extra attempts after a timeout, connection error or 5xx
+RETRY_BACKOFF = 0.5  # Seconds; the backoff window doubles with every attempt
+POOL_SIZE = 10  # Keep-alive connections kept open to the API
+# The free plan allows 1,000,000 calls a month, which is about 0.38 calls a second spread evenly
+RATE_LIMIT_PER_SECOND = 1_000_000 / (30 * 24 * 60 * 60)
+RATE_LIMIT_BURST = 30  # Calls allowed back to back before the rate applies
+
+_connect_timing = threading.local()  # Seconds spent opening a connection during the current request
+
+def make_timed_adapter(**kwargs):
+    """Build a connection-pooling adapter whose connections report their connect time
+    
+    The classes are defined here rather than at module level so that requests and urllib3
+    are only imported once the app actually goes to the network.
+    """
+    import urllib3
+    from requests.adapters import HTTPAdapter
+    
+    class TimedHTTPSConnection(urllib3.connection.HTTPSConnection):
+        """HTTPS connection that records how long connecting (DNS, TCP, TLS) took"""
+        
+        def connect(self):
+            start = time.perf_counter()
+            super().connect()
+            _connect_timing.seconds = getattr(_connect_timing, "seconds", 0.0) + time.perf_counter() - start
+    
+    class TimedHTTPConnection(urllib3.connection.HTTPConnection):
+        """Plain HTTP counterpart of TimedHTTPSConnection"""
+        
+        def connect(self):
+            start = time.perf_counter()
+            super().connect()
+            _connect_timing.seconds = getattr(_connect_timing, "seconds", 0.0) + time.perf_counter() - start
+    
+    class TimedHTTPSConnectionPool(urllib3.HTTPSConnectionPool):
+        ConnectionCls = TimedHTTPSConnection
+    
+    class TimedHTTPConnectionPool(urllib3.HTTPConnectionPool):
+        ConnectionCls = TimedHTTPConnection
+    
+    class TimedHTTPAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {"http": TimedHTTPConnectionPool, "https": TimedHTTPSConnectionPool}
+    
+    return TimedHTTPAdapter(**kwargs)
+
+class TokenBucket:
+    """Thread-safe token bucket rate limiter"""
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Take one token, sleeping until one is available"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class WeatherClient:
+    """Shared API client: one keep-alive session, bounded retries and a rate limit
+    
+    limiter may be None for servers without a rate limit, such as a local stand-in.
+    """
+    
+    def __init__(self, base_url=API_BASE_URL, rate=RATE_LIMIT_PER_SECOND, burst=RATE_LIMIT_BURST):
+        self.base_url = base_url
+        self.limiter = TokenBucket(rate, burst)
+        self.timings = deque(maxlen=100)  # Most recent request timings
+        self.recorder = None  # FixtureStore that final responses are saved to, if recording
+        self._session = None
+        self._session_lock = threading.Lock()
+    
+    @property
+    def session(self):
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                self._session = requests.Session()
+                adapter = make_timed_adapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+                self._session.mount("https://", adapter)
+                self._session.mount("http://", adapter)
+            return self._session
+    
+    def get_forecast(self, location, days=None):
+        """Fetch the forecast endpoint; returns (data, timing)
         
-        # Send the request
-        response = requests.get(url, timeout=10)
+        timing holds seconds spent connecting, until the first byte, in total, plus the attempt count.
+        """
+        session = self.session
+        from requests.exceptions import Timeout, ConnectionError  # Loaded by the session above
+        url = f"{self.base_url}/forecast.json"
+        params = {"key": API_KEY, "q": location, "days": days or FORECAST_DAYS, "aqi": "no", "alerts": "no"}
+        started = time.perf_counter()
         
+        for attempt in range(MAX_RETRIES + 1):
+            if self.limiter is not None:
+                self.limiter.acquire()
+            _connect_timing.seconds = 0.0
+            request_start = time.perf_counter()
+            retry_after = None
+            
+            try:
+                # stream=True returns as soon as the headers are in, which gives us the time to first byte
+                response = session.get(url, params=params, timeout=REQUEST_TIMEOUT, stream=True)
+                ttfb = time.perf_counter() - request_start
+                body = response.content
+            except (Timeout, ConnectionError):
+                if attempt == MAX_RETRIES:
+                    raise
+            else:
+                if response.status_code < 500 and response.status_code != 429:
+                    timing = {
+                        "connect": _connect_timing.seconds,
+                        "ttfb": ttfb,
+                        "total": time.perf_counter() - started,
+                        "attempts": attempt + 1,
+                        "status": response.status_code,
+                    }
+                    self.timings.append(timing)
+                    latency.add("http.total", timing["total"])
+                    latency.add("http.ttfb", ttfb)
+                    if timing["connect"]:
+                        latency.add("http.connect", timing["connect"])
+                    if self.recorder is not None:
+                        self.recorder.save(location, response.status_code, body)
+                    return self._parse_response(response, body), timing
+                if attempt == MAX_RETRIES:
+                    raise ValueError(f"API Error: Status code {response.status_code}")
+                retry_after = response.headers.get("Retry-After")
+            
+            # Full jitter: sleep a random time in a window that doubles with every attempt
+            delay = random.uniform(0, RETRY_BACKOFF * 2 ** attempt)
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            time.sleep(delay)
+    
+    @staticmethod
+    def _parse_response(response, body):
         # Check if request was successful
         if response.status_code == 200:
-            data = response.json()
-            return data
+            with latency.span("decode"):
+                return json.loads(body)
         elif response.status_code == 400:
             # 400 typically means the location wasn't found
-            error_response = response.json()
+            error_response = json.loads(body)
             error_message = error_response.get('error', {}).get('message', 'Location not found')
             raise ValueError(f"API Error: {error_message}")
         else:
             # Other error codes
             raise ValueError(f"API Error: Status code {response.status_code}")
+
+weather_client = WeatherClient()
+
+# Fixtures: real responses recorded with --record and served by a local stand-in API
+STANDIN_PORT = 8642
+
+class FixtureStore:
+    """Directory of recorded API responses, one file per normalized location"""
+    
+    def __init__(self, directory):
+        self.directory = directory
+        self._memory = {}
+        self._lock = threading.Lock()
+    
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+    
+    def save(self, location, status, body):
+        """Record a response body; the file is replaced atomically"""
+        key = normalize_location(location)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"location": location, "key": key, "status": status, "body": body.decode("utf-8")}, f)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"Could not record fixture: {str(e)}", file=sys.stderr)
+    
+    def load(self, location):
+        """Return (status, body bytes) recorded for a location, or None"""
+        key = normalize_location(location)
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                fixture = json.load(f)
+            result = (fixture["status"], fixture["body"].encode("utf-8"))
+        except (OSError, ValueError, KeyError):
+            return None
+        with self._lock:
+            self._memory[key] = result
+        return result
+
+def make_standin_server(fixtures, port=STANDIN_PORT, latency=0.0, jitter=0.0, error_rate=0.0, quiet=False):
+    """Local HTTP stand-in for the weather API with artificial latency and errors
+    
+    latency is the fixed delay per request and jitter a random extra on top, both in
+    seconds; error_rate is the fraction of requests answered with a 503. port 0 picks
+    a free port. http.server is only imported when a stand-in is actually wanted.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    
+    class StandInHandler(BaseHTTPRequestHandler):
+        """Answers /forecast.json the way weatherapi.com does, from recorded fixtures"""
+        protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+        
+        def do_GET(self):
+            server = self.server
+            url = urlparse(self.path)
+            if not url.path.endswith("/forecast.json"):
+                self._send(404, {"error": {"code": 1005, "message": "API request url is invalid."}})
+                return
+        
+            if server.latency or server.jitter:
+                time.sleep(server.latency + random.uniform(0, server.jitter))
+            if server.error_rate and random.random() < server.error_rate:
+                self._send(503, {"error": {"code": 9999, "message": "Injected error from the stand-in server."}})
+                return
+        
+            location = parse_qs(url.query).get("q", [""])[0]
+            fixture = server.fixtures.load(location)
+            if fixture is None:
+                self._send(400, {"error": {"code": 1006, "message": "No matching location found."}})
+                return
+            status, body = fixture
+            self._send(status, body)
+        
+        def _send(self, status, payload):
+            body = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            if not self.server.quiet:
+                super().log_message(format, *args)
+
+    class StandInServer(ThreadingHTTPServer):
+        daemon_threads = True
+        
+        def __init__(self):
+            super().__init__(("127.0.0.1", port), StandInHandler)
+            self.fixtures = fixtures
+            self.latency = latency
+            self.jitter = jitter
+            self.error_rate = error_rate
+            self.quiet = quiet
+        
+        @property
+        def base_url(self):
+            return f"http://127.0.0.1:{self.server_address[1]}/v1"
+        
+        def start(self):
+            """Serve from a background thread"""
+            thread = threading.Thread(target=self.serve_forever, name="standin-api", daemon=True)
+            thread.start()
+            return thread
+        
+    return StandInServer()
+
+def cache_key_for(location, days=None):
+    """Response cache key; responses with a non-default number of forecast days are kept apart"""
+    key = normalize_location(location)
+    days = days or FORECAST_DAYS
+    return key if days == DEFAULT_FORECAST_DAYS else f"{key}|{days}d"
+
+def get_weather_entry(location, section="current", force=False, days=None):
+    """Get (fetched_at, data) for a location, from the cache while the section we need is still fresh
+    
+    section is "current" when current conditions are shown (CURRENT_TTL applies) or
+    "forecast" when only the forecast is needed (FORECAST_TTL applies). force skips the
+    cache lookup, for refreshes that run ahead of expiry. days defaults to FORECAST_DAYS.
+    """
+    max_age = CURRENT_TTL if section == "current" else FORECAST_TTL
+    days = days or FORECAST_DAYS
+    cache_key = cache_key_for(location, days)
+    if not force:
+        entry = response_cache.get_entry(cache_key)
+        if entry is not None and time.time() - entry[0] <= max_age:
+            return entry
+    
+    data = fetch_weather_data(location, days)
+    fetched_at = time.time()
+    response_cache.put(cache_key, data)
+    history.record(location, data, fetched_at)
+    return fetched_at, data
+
+def get_weather_data(location, section="current"):
+    """Get weather data for a location, from the cache while the section we need is still fresh"""
+    return get_weather_entry(location, section)[1]
+
+# Refreshes of the same location closer together than this many seconds are ignored
+REFRESH_DEBOUNCE = 2.0
+
+class RequestCoordinator:
+    """Coalesces concurrent requests for the same location into one in-flight fetch
+    
+    The first caller for a location does the fetch; everyone who asks while it is
+    in flight waits for and shares that result (or error).
+    """
+    
+    def __init__(self):
+        self._in_flight = {}  # (normalized location, section) -> Future
+        self._lock = threading.Lock()
+    
+    def get(self, location, section="current"):
+        """Return weather data for a location"""
+        return self.get_entry(location, section)[1]
+    
+    def get_entry(self, location, section="current", force=False, days=None):
+        """Return (fetched_at, data) for a location; see get_weather_entry"""
+        key = (cache_key_for(location, days), section)
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+        
+        if not owner:
+            return future.result()
+        
+        try:
+            entry = get_weather_entry(location, section, force, days)
+            future.set_result(entry)
+            return entry
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+    
+    def in_flight(self):
+        """Number of fetches currently running"""
+        with self._lock:
+            return len(self._in_flight)
+
+request_coordinator = RequestCoordinator()
+
+def load_report(location, force=False, section="current", days=None):
+    """Fetch (through the coordinator) and parse the weather for one location
+    
+    Views that only show the forecast pass section="forecast" and accept data up to FORECAST_TTL old.
+    """
+    with latency.span("get_weather"):
+        fetched_at, data = request_coordinator.get_entry(location, section, force, days)
+    with latency.span("model"):
+        return WeatherReport(data, fetched_at, normalize_location(location))
+
+# Background refresh: shown locations are refetched shortly before their data expires
+REFRESH_TICK = 5  # Seconds between checks for locations that are due
+REFRESH_AHEAD = 0.85  # Refresh once this fraction of CURRENT_TTL has passed...
+REFRESH_JITTER = 0.1  # ...minus up to this fraction, so locations don't all refresh together
+ERROR_BACKOFF = 30  # Seconds before retrying a failed refresh; doubles with every failure
+MAX_ERROR_BACKOFF = 15 * 60
+
+class RefreshScheduler:
+    """Works out when each shown location is due for a background refresh"""
+    
+    def __init__(self):
+        self.due = {}  # normalized location -> wall-clock time of the next refresh
+        self.failures = {}  # normalized location -> failed refreshes in a row
+    
+    def succeeded(self, location, fetched_at):
+        key = normalize_location(location)
+        self.failures.pop(key, None)
+        self.due[key] = fetched_at + CURRENT_TTL * (REFRESH_AHEAD - random.uniform(0, REFRESH_JITTER))
+    
+    def failed(self, location):
+        key = normalize_location(location)
+        failures = self.failures[key] = self.failures.get(key, 0) + 1
+        backoff = min(MAX_ERROR_BACKOFF, ERROR_BACKOFF * 2 ** (failures - 1))
+        self.due[key] = time.time() + random.uniform(backoff / 2, backoff)
+    
+    def is_due(self, location, now):
+        due = self.due.get(normalize_location(location))
+        return due is not None and due <= now
+
+def is_stale(report, now=None):
+    """True once a report is older than the current conditions TTL"""
+    return (now or time.time()) - report.fetched_at > CURRENT_TTL
+
+def format_fetched_at(fetched_at):
+    """Clock time for today's data, date and time for anything older"""
+    moment = time.localtime(fetched_at)
+    if time.strftime("%Y-%m-%d", moment) == time.strftime("%Y-%m-%d"):
+        return time.strftime("%H:%M", moment)
+    return time.strftime("%b %d %H:%M", moment)
+
+def stale_label(report):
+    return f"⚠ Stale, updated {format_fetched_at(report.fetched_at)}"
+
+def load_snapshot(location):
+    """Parse the last cached data for a location, however old; None if there is none"""
+    entry = response_cache.get_entry(cache_key_for(location))
+    if entry is None:
+        return None
+    try:
+        with latency.span("model"):
+            return WeatherReport(entry[1], entry[0], normalize_location(location))
+    except ValueError:
+        return None
+
+# Favorites: saved locations shown side by side
+FAVORITES_FILE = os.environ.get("WEATHER_FAVORITES") or os.path.join(os.path.expanduser("~"), ".config", "pyos-weather", "favorites.json")
+FAVORITES_CONCURRENCY = 4  # Favorites fetched at the same time; stays below POOL_SIZE
+
+def load_favorites(path=FAVORITES_FILE):
+    """Return the saved favorite locations, or an empty list"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            favorites = json.load(f)
+    except (OSError, ValueError):
+        return []
+    return [location for location in favorites if isinstance(location, str) and location.strip()]
+
+def save_favorites(favorites, path=FAVORITES_FILE):
+    """Write the favorite locations; the file is replaced atomically"""
+    try:
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(favorites, f, indent=2)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Could not save favorites: {str(e)}", file=sys.stderr)
+
+# Offline gazetteer: a memory-mapped prefix index of places for as-you-type suggestions.
+# Picking a suggestion queries the API by coordinates, which never fails to resolve and
+# always lands on the same cache key.
+GAZETTEER_FILE = os.environ.get("WEATHER_GAZETTEER") or os.path.join(CACHE_DIR, "gazetteer.bin")
+GAZETTEER_MAGIC = b"WGAZ\x00\x00\x00\x01"
+SUGGESTION_LIMIT = 8
+# Common short forms typed after the comma, mapped to the country names places are stored with
+COUNTRY_ALIASES = {"uk": "united kingdom", "gb": "united kingdom", "us": "united states", "usa": "united states", "uae": "united arab emirates"}
+
+# Header: magic, then count and offset of places, keys and short prefixes, then where the strings start
+GAZ_HEADER = struct.Struct("<8sIIIIIII")
+GAZ_PLACE = struct.Struct("<IIIffI")  # name, region, country (string offsets), lat, lon, population
+GAZ_POPULATION = struct.Struct("<I")  # Just the last field of GAZ_PLACE, for ranking
+GAZ_KEY = struct.Struct("<II")  # folded name (string offset), place number; sorted by name
+GAZ_PREFIX = struct.Struct("<2s" + "I" * SUGGESTION_LIMIT)  # 1-2 letter prefix, most populous places
+GAZ_NO_PLACE = 0xFFFFFFFF
+
+# Used until a bigger gazetteer is built with --build-gazetteer
+SEED_PLACES = (
+    # name, region, country, lat, lon, population
+    ("London", "England", "United Kingdom", 51.5074, -0.1278, 8982000),
+    ("Manchester", "England", "United Kingdom", 53.4808, -2.2426, 553000),
+    ("Birmingham", "England", "United Kingdom", 52.4862, -1.8904, 1144000),
+    ("Edinburgh", "Scotland", "United Kingdom", 55.9533, -3.1883, 527000),
+    ("Glasgow", "Scotland", "United Kingdom", 55.8642, -4.2518, 635000),
+    ("Cardiff", "Wales", "United Kingdom", 51.4816, -3.1791, 362000),
+    ("Belfast", "Northern Ireland", "United Kingdom", 54.5973, -5.9301, 345000),
+    ("Dublin", "Leinster", "Ireland", 53.3498, -6.2603, 1173000),
+    ("Paris", "Ile-de-France", "France", 48.8566, 2.3522, 2161000),
+    ("Marseille", "Provence-Alpes-Cote d'Azur", "France", 43.2965, 5.3698, 861000),
+    ("Lyon", "Auvergne-Rhone-Alpes", "France", 45.7640, 4.8357, 513000),
+    ("Berlin", "Berlin", "Germany", 52.5200, 13.4050, 3645000),
+    ("Hamburg", "Hamburg", "Germany", 53.5511, 9.9937, 1841000),
+    ("Munich", "Bavaria", "Germany", 48.1351, 11.5820, 1472000),
+    ("Amsterdam", "North Holland", "Netherlands", 52.3676, 4.9041, 872000),
+    ("Brussels", "Brussels", "Belgium", 50.8503, 4.3517, 1209000),
+    ("Madrid", "Madrid", "Spain", 40.4168, -3.7038, 3223000),
+    ("Barcelona", "Catalonia", "Spain", 41.3874, 2.1686, 1620000),
+    ("Lisbon", "Lisbon", "Portugal", 38.7223, -9.1393, 505000),
+    ("Rome", "Lazio", "Italy", 41.9028, 12.4964, 2873000),
+    ("Milan", "Lombardy", "Italy", 45.4642, 9.1900, 1352000),
+    ("Vienna", "Vienna", "Austria", 48.2082, 16.3738, 1897000),
+    ("Zurich", "Zurich", "Switzerland", 47.3769, 8.5417, 421000),
+    ("Copenhagen", "Capital Region", "Denmark", 55.6761, 12.5683, 602000),
+    ("Stockholm", "Stockholm", "Sweden", 59.3293, 18.0686, 975000),
+    ("Oslo", "Oslo", "Norway", 59.9139, 10.7522, 697000),
+    ("Helsinki", "Uusimaa", "Finland", 60.1699, 24.9384, 656000),
+    ("Warsaw", "Masovia", "Poland", 52.2297, 21.0122, 1790000),
+    ("Prague", "Prague", "Czechia", 50.0755, 14.4378, 1309000),
+    ("Budapest", "Budapest", "Hungary", 47.4979, 19.0402, 1752000),
+    ("Athens", "Attica", "Greece", 37.9838, 23.7275, 664000),
+    ("Istanbul", "Istanbul", "Turkey", 41.0082, 28.9784, 15460000),
+    ("Moscow", "Moscow", "Russia", 55.7558, 37.6173, 12506000),
+    ("Kyiv", "Kyiv", "Ukraine", 50.4501, 30.5234, 2884000),
+    ("Cairo", "Cairo", "Egypt", 30.0444, 31.2357, 9540000),
+    ("Lagos", "Lagos", "Nigeria", 6.5244, 3.3792, 14862000),
+    ("Nairobi", "Nairobi", "Kenya", -1.2921, 36.8219, 4397000),
+    ("Johannesburg", "Gauteng", "South Africa", -26.2041, 28.0473, 5635000),
+    ("Cape Town", "Western Cape", "South Africa", -33.9249, 18.4241, 4618000),
+    ("Dubai", "Dubai", "United Arab Emirates", 25.2048, 55.2708, 3331000),
+    ("Mumbai", "Maharashtra", "India", 19.0760, 72.8777, 12442000),
+    ("Delhi", "Delhi", "India", 28.7041, 77.1025, 16787000),
+    ("Bangalore", "Karnataka", "India", 12.9716, 77.5946, 8443000),
+    ("Singapore", "", "Singapore", 1.3521, 103.8198, 5686000),
+    ("Bangkok", "Bangkok", "Thailand", 13.7563, 100.5018, 10539000),
+    ("Jakarta", "Jakarta", "Indonesia", -6.2088, 106.8456, 10562000),
+    ("Hong Kong", "", "Hong Kong", 22.3193, 114.1694, 7482000),
+    ("Shanghai", "Shanghai", "China", 31.2304, 121.4737, 24870000),
+    ("Beijing", "Beijing", "China", 39.9042, 116.4074, 21540000),
+    ("Seoul", "Seoul", "South Korea", 37.5665, 126.9780, 9776000),
+    ("Tokyo", "Tokyo", "Japan", 35.6762, 139.6503, 13960000),
+    ("Osaka", "Osaka", "Japan", 34.6937, 135.5023, 2691000),
+    ("Sydney", "New South Wales", "Australia", -33.8688, 151.2093, 5312000),
+    ("Melbourne", "Victoria", "Australia", -37.8136, 144.9631, 5078000),
+    ("Auckland", "Auckland", "New Zealand", -36.8485, 174.7633, 1657000),
+    ("New York", "New York", "United States of America", 40.7128, -74.0060, 8336000),
+    ("Los Angeles", "California", "United States of America", 34.0522, -118.2437, 3979000),
+    ("San Francisco", "California", "United States of America", 37.7749, -122.4194, 874000),
+    ("Seattle", "Washington", "United States of America", 47.6062, -122.3321, 737000),
+    ("Chicago", "Illinois", "United States of America", 41.8781, -87.6298, 2694000),
+    ("Houston", "Texas", "United States of America", 29.7604, -95.3698, 2320000),
+    ("Miami", "Florida", "United States of America", 25.7617, -80.1918, 467000),
+    ("Boston", "Massachusetts", "United States of America", 42.3601, -71.0589, 692000),
+    ("Washington", "District of Columbia", "United States of America", 38.9072, -77.0369, 705000),
+    ("Paris", "Texas", "United States of America", 33.6609, -95.5555, 25000),
+    ("London", "Ontario", "Canada", 42.9849, -81.2453, 404000),
+    ("Toronto", "Ontario", "Canada", 43.6532, -79.3832, 2731000),
+    ("Vancouver", "British Columbia", "Canada", 49.2827, -123.1207, 675000),
+    ("Montreal", "Quebec", "Canada", 45.5017, -73.5673, 1780000),
+    ("Mexico City", "Mexico City", "Mexico", 19.4326, -99.1332, 9209000),
+    ("Sao Paulo", "Sao Paulo", "Brazil", -23.5505, -46.6333, 12330000),
+    ("Rio de Janeiro", "Rio de Janeiro", "Brazil", -22.9068, -43.1729, 6748000),
+    ("Buenos Aires", "Buenos Aires", "Argentina", -34.6037, -58.3816, 3075000),
+    ("Lima", "Lima", "Peru", -12.0464, -77.0428, 9752000),
+    ("Bogota", "Bogota", "Colombia", 4.7110, -74.0721, 7413000),
+    ("Santiago", "Santiago Metropolitan", "Chile", -33.4489, -70.6693, 6310000),
+)
+
+def fold_place_name(text):
+    """Lower-case ASCII form of a place name used for matching, e.g. São Paulo -> sao paulo"""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if c.isascii() and (c.isalnum() or c in " -'")).lower()
+    return " ".join(text.replace("-", " ").replace("'", "").split())
+
+class Place:
+    """One gazetteer entry"""
+    __slots__ = ("name", "region", "country", "lat", "lon", "population")
+    
+    def __init__(self, name, region, country, lat, lon, population):
+        self.name = name
+        self.region = region
+        self.country = country
+        self.lat = lat
+        self.lon = lon
+        self.population = population
+    
+    @property
+    def label(self):
+        return ", ".join(part for part in (self.name, self.region, self.country) if part)
+    
+    @property
+    def query(self):
+        """Canonical API query: coordinates always resolve and normalize to a stable cache key"""
+        return f"{self.lat:.4f},{self.lon:.4f}"
+
+def build_gazetteer(places, path=GAZETTEER_FILE):
+    """Write places, an iterable of (name, region, country, lat, lon, population), as a gazetteer file
+    
+    Returns the number of places written. The file is replaced atomically.
+    """
+    strings = bytearray()
+    string_offsets = {}
+    def intern(text):
+        if text not in string_offsets:
+            encoded = text.encode("utf-8")[:0xFFFF]
+            string_offsets[text] = len(strings)
+            strings.extend(struct.pack("<H", len(encoded)))
+            strings.extend(encoded)
+        return string_offsets[text]
+    
+    records = []
+    keys = []
+    for name, region, country, lat, lon, population in places:
+        key = fold_place_name(name)
+        if not key:
+            continue
+        number = len(records)
+        records.append(GAZ_PLACE.pack(intern(name), intern(region), intern(country), lat, lon, min(population, 0xFFFFFFFF)))
+        keys.append((key, -population, number))
+    if not records:
+        raise ValueError("no places to index")
+    keys.sort()
+    
+    # The shortest prefixes match too many names to rank at lookup time, so their answers are stored
+    top = {}
+    for key, neg_population, number in keys:
+        for length in (1, 2):
+            if len(key) >= length:
+                top.setdefault(key[:length], []).append((neg_population, number))
+    prefixes = []
+    for prefix in sorted(top):
+        numbers = []
+        for _, number in sorted(top[prefix]):
+            if number not in numbers:
+                numbers.append(number)
+            if len(numbers) == SUGGESTION_LIMIT:
+                break
+        numbers += [GAZ_NO_PLACE] * (SUGGESTION_LIMIT - len(numbers))
+        prefixes.append(GAZ_PREFIX.pack(prefix.encode("ascii"), *numbers))
+    
+    key_records = [GAZ_KEY.pack(intern(key), number) for key, _, number in keys]
+    places_offset = GAZ_HEADER.size
+    keys_offset = places_offset + GAZ_PLACE.size * len(records)
+    prefixes_offset = keys_offset + GAZ_KEY.size * len(key_records)
+    strings_offset = prefixes_offset + GAZ_PREFIX.size * len(prefixes)
+    header = GAZ_HEADER.pack(
+        GAZETTEER_MAGIC, len(records), len(key_records), len(prefixes),
+        places_offset, keys_offset, prefixes_offset, strings_offset
+    )
+    
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(header)
+        f.write(b"".join(records))
+        f.write(b"".join(key_records))
+        f.write(b"".join(prefixes))
+        f.write(strings)
+    os.replace(tmp_path, path)
+    return len(records)
+
+def read_geonames_names(directory):
+    """Region and country names from the admin1CodesASCII.txt and countryInfo.txt next to a GeoNames dump
+    
+    Returns ({"GB.ENG": "England", ...}, {"GB": "United Kingdom", ...}); a file that is
+    missing leaves its dictionary empty, and those places keep their codes.
+    """
+    names = []
+    for filename, code_column, name_column in (("admin1CodesASCII.txt", 0, 1), ("countryInfo.txt", 0, 4)):
+        found = {}
+        try:
+            with open(os.path.join(directory, filename), "r", encoding="utf-8", newline="") as f:
+                for row in csv.reader(f, delimiter="\t"):
+                    if len(row) > name_column and not row[0].startswith("#"):
+                        found[row[code_column]] = row[name_column]
+        except OSError:
+            pass
+        names.append(found)
+    return names[0], names[1]
+
+def read_place_source(path):
+    """Yield places from a GeoNames cities dump (tab separated) or a CSV of name,region,country,lat,lon[,population]
+    
+    GeoNames dumps only have region and country codes; they are turned into names when
+    admin1CodesASCII.txt and countryInfo.txt from GeoNames sit in the same directory.
+    """
+    regions, countries = read_geonames_names(os.path.dirname(path) or ".") if path.endswith(".txt") else ({}, {})
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.reader(f, delimiter="\t" if path.endswith(".txt") else ","):
+            try:
+                if len(row) >= 15:
+                    # GeoNames: name, lat, lon, country code, admin1 code, population
+                    country, region = row[8], row[10]
+                    region = regions.get(f"{country}.{region}", region)
+                    country = countries.get(country, country)
+                    yield row[1], region, country, float(row[4]), float(row[5]), int(row[14] or 0)
+                elif len(row) >= 5:
+                    population = int(row[5]) if len(row) > 5 and row[5] else 0
+                    yield row[0].strip(), row[1].strip(), row[2].strip(), float(row[3]), float(row[4]), population
+            except ValueError:
+                continue  # A header line, or a broken row
+
+class Gazetteer:
+    """Read-only, memory-mapped view of a gazetteer file
+    
+    Lookups binary-search the sorted keys straight from the mapping, so opening the file
+    costs nothing and only the pages a lookup touches are read.
+    """
     
-    except requests.exceptions.RequestException as e:
+    def __init__(self, path=GAZETTEER_FILE):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.place_count, self.key_count, self.prefix_count,
+         self._places, self._keys, self._prefixes, self._strings) = GAZ_HEADER.unpack_from(self._map, 0)
+        if magic != GAZETTEER_MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a gazetteer file")
+        self._folded = {}  # String offset -> folded string, for region/country filters
+    
+    def close(self):
+        self._map.close()
+    
+    def __len__(self):
+        return self.place_count
+    
+    def _string(self, offset):
+        start = self._strings + offset
+        (length,) = struct.unpack_from("<H", self._map, start)
+        return self._map[start + 2:start + 2 + length].decode("utf-8")
+    
+    def _key(self, index):
+        offset, number = GAZ_KEY.unpack_from(self._map, self._keys + index * GAZ_KEY.size)
+        return self._string(offset), number
+    
+    def _record(self, number):
+        return GAZ_PLACE.unpack_from(self._map, self._places + number * GAZ_PLACE.size)
+    
+    def _fold(self, offset):
+        if offset not in self._folded:
+            self._folded[offset] = fold_place_name(self._string(offset))
+        return self._folded[offset]
+    
+    def place(self, number):
+        name, region, country, lat, lon, population = self._record(number)
+        return Place(self._string(name), self._string(region), self._string(country), round(lat, 4), round(lon, 4), population)
+    
+    def _first_key(self, prefix):
+        """Index of the first key that is >= prefix"""
+        lo, hi = 0, self.key_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid)[0] < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+    
+    def _short_prefix(self, prefix):
+        """Stored answer for a one or two letter prefix"""
+        wanted = prefix.encode("ascii")
+        lo, hi = 0, self.prefix_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry = GAZ_PREFIX.unpack_from(self._map, self._prefixes + mid * GAZ_PREFIX.size)
+            stored = entry[0].rstrip(b"\x00")
+            if stored == wanted:
+                return [self.place(number) for number in entry[1:] if number != GAZ_NO_PLACE]
+            if stored < wanted:
+                lo = mid + 1
+            else:
+                hi = mid
+        return []
+    
+    def _ranked(self, lo, hi, qualifier, limit):
+        """The most populous places among keys lo..hi, optionally narrowed by region or country"""
+        # Only fixed-size records are read while ranking; names are decoded for the winners
+        with memoryview(self._map) as view:
+            numbers = [number for _, number in GAZ_KEY.iter_unpack(view[self._keys + lo * GAZ_KEY.size:self._keys + hi * GAZ_KEY.size])]
+        if qualifier:
+            alias = COUNTRY_ALIASES.get(qualifier)
+            matching = []
+            for number in numbers:
+                _, region, country, _, _, _ = self._record(number)
+                region, country = self._fold(region), self._fold(country)
+                if region.startswith(qualifier) or country.startswith(qualifier) or (alias and country.startswith(alias)):
+                    matching.append(number)
+            numbers = matching
+        population_at = self._places + GAZ_PLACE.size - GAZ_POPULATION.size
+        ranked = heapq.nsmallest(limit, (
+            (-GAZ_POPULATION.unpack_from(self._map, population_at + number * GAZ_PLACE.size)[0], number)
+            for number in numbers
+        ))
+        return [self.place(number) for _, number in ranked]
+    
+    def suggest(self, text, limit=SUGGESTION_LIMIT):
+        """Places whose name starts with text, most populous first
+        
+        Anything after a comma narrows the matches by region or country: "paris, us".
+        """
+        name, _, qualifier = text.partition(",")
+        prefix = fold_place_name(name)
+        qualifier = fold_place_name(qualifier)
+        if not prefix:
+            return []
+        if len(prefix) <= 2 and not qualifier:
+            return self._short_prefix(prefix)[:limit]
+        # Folded keys are printable ASCII, so prefix + DEL sorts after every key that starts with prefix
+        return self._ranked(self._first_key(prefix), self._first_key(prefix + "\x7f"), qualifier, limit)
+    
+    def lookup(self, text):
+        """The most populous place whose whole name matches text, or None"""
+        name, _, qualifier = text.partition(",")
+        name = fold_place_name(name)
+        if not name:
+            return None
+        # Keys equal to name sort before name + NUL, which sorts before any longer key
+        places = self._ranked(self._first_key(name), self._first_key(name + "\x00"), fold_place_name(qualifier), 1)
+        return places[0] if places else None
+
+_gazetteer = None
+
+def open_gazetteer():
+    """Return the shared gazetteer, building it from SEED_PLACES on first use; None if unavailable"""
+    global _gazetteer
+    if _gazetteer is None:
+        try:
+            if not os.path.exists(GAZETTEER_FILE):
+                build_gazetteer(SEED_PLACES)
+            _gazetteer = Gazetteer(GAZETTEER_FILE)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"Could not open gazetteer: {str(e)}", file=sys.stderr)
+            return None
+    return _gazetteer
+
+# Batch mode: locations fetched at the same time; matches the keep-alive pool
+BATCH_CONCURRENCY = POOL_SIZE
+
+def weather_record(location, data):
+    """Flatten an API response into the one-line record batch mode prints"""
+    current = data["current"]
+    place = data["location"]
+    return {
+        "location": location,
+        "ok": True,
+        "name": place.get("name"),
+        "region": place.get("region"),
+        "country": place.get("country"),
+        "lat": place.get("lat"),
+        "lon": place.get("lon"),
+        "localtime": place.get("localtime"),
+        "condition": current["condition"]["text"],
+        "temp_c": current.get("temp_c"),
+        "temp_f": current.get("temp_f"),
+        "feelslike_c": current.get("feelslike_c"),
+        "feelslike_f": current.get("feelslike_f"),
+        "humidity": current.get("humidity"),
+        "wind_kph": current.get("wind_kph"),
+        "wind_dir": current.get("wind_dir"),
+        "pressure_mb": current.get("pressure_mb"),
+        "uv": current.get("uv"),
+    }
+
+def read_locations(stream):
+    """Yield (line number, location) for every non-empty, non-comment line"""
+    for number, line in enumerate(stream, 1):
+        location = line.strip()
+        if location and not location.startswith("#"):
+            yield number, location
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def run_batch(stream, concurrency=BATCH_CONCURRENCY, out=sys.stdout, err=sys.stderr):
+    """Fetch every location in stream and write one JSON line per location as it finishes
+    
+    Lines come out in completion order; "line" holds the input line number for scripts that
+    want the input order back. Only a few batches' worth of locations are queued at once, so
+    arbitrarily long inputs are streamed rather than read up front. Returns the exit status.
+    """
+    concurrency = max(1, concurrency)
+    max_queued = concurrency * 4
+    latencies = []
+    failures = 0
+    started = time.perf_counter()
+    
+    def fetch(number, location):
+        request_start = time.perf_counter()
+        try:
+            with latency.span("get_weather"):
+                data = request_coordinator.get(location)
+            record = weather_record(location, data)
+        except Exception as e:
+            record = {"location": location, "ok": False, "error": str(e)}
+        record["line"] = number
+        record["elapsed"] = round(time.perf_counter() - request_start, 4)
+        return record
+    
+    locations = read_locations(stream)
+    pending = set()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as executor:
+        while True:
+            for number, location in locations:
+                pending.add(executor.submit(fetch, number, location))
+                if len(pending) >= max_queued:
+                    break
+            if not pending:
+                break
+            
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                record = future.result()
+                latencies.append(record["elapsed"])
+                failures += not record["ok"]
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+    
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    count = len(latencies)
+    err.write(
+        f"{count} locations ({count - failures} ok, {failures} failed) in {elapsed:.2f}s, "
+        f"{count / elapsed if elapsed else 0:.1f}/s with {concurrency} workers\n"
+        f"latency p50 {percentile(latencies, 0.5) * 1000:.0f} ms, p90 {percentile(latencies, 0.9) * 1000:.0f} ms, "
+        f"p99 {percentile(latencies, 0.99) * 1000:.0f} ms, max {(latencies[-1] if latencies else 0) * 1000:.0f} ms\n"
+    )
+    return 1 if failures else 0
+
+def fetch_weather_data(location, days=None):
+    """Get weather data for a location using a real weather API"""
+    from requests.exceptions import RequestException
+    try:
+        # Pooled session with retries and rate limiting
+        data, _ = weather_client.get_forecast(location, days)
+        return data
+    
+    except RequestException as e:
         # Network errors, timeouts, etc.
         raise ValueError(f"Connection error: {str(e)}")
     except ValueError as e:
@@ -98,147 +1434,6 @@ def get_weather_data(location):
     except Exception as e:
         # Any other unexpected error
         raise ValueError(f"Unexpected error: {str(e)}")
-        
-    # If we're here, fall back to mock data
-    # This is a fallback in case the API is unavailable
-    parts = [part.strip() for part in location.split(',')]
-    city = parts[0]
-    region = parts[1] if len(parts) > 1 else ""
-    country = parts[2] if len(parts) > 2 else ""
-    
-    import random
-    random.seed(city.lower())
-    
-    current_date = datetime.now()
-    temp_c = random.randint(0, 35)
-    temp_f = int(temp_c * 9/5 + 32)
-    
-    conditions = ["Sunny", "Partly cloudy", "Cloudy", "Light rain", "Heavy rain"]
-    condition = random.choice(conditions)
-    
-    mock_data = {
-        "location": {
-            "name": city,
-            "region": region,
-            "country": country,
-            "localtime": current_date.strftime("%Y-%m-%d %H:%M")
-        },
-        "current": {
-            "temp_c": temp_c,
-            "temp_f": temp_f,
-            "condition": {
-                "text": condition,
-                "icon": "//cdn.weatherapi.com/weather/64x64/day/116.png"
-            },
-            "wind_mph": random.randint(0, 30),
-            "wind_kph": random.randint(0, 50),
-            "wind_dir": random.choice(["N", "NE", "E", "SE", "S", "SW", "W", "NW"]),
-            "pressure_mb": random.randint(980, 1030),
-            "humidity": random.randint(30, 90),
-            "feelslike_c": temp_c + random.randint(-3, 3),
-            "feelslike_f": temp_f + random.randint(-5, 5),
-            "uv": random.randint(1, 10)
-        },
-        "current": {
-            "temp_c": 22.5,
-            "temp_f": 72.5,
-            "condition": {
-                "text": "Partly cloudy",
-                "icon": "//cdn.weatherapi.com/weather/64x64/day/116.png"
-            },
-            "wind_mph": 5.6,
-            "wind_kph": 9.0,
-            "wind_dir": "NW",
-            "pressure_mb": 1012,
-            "humidity": 65,
-            "feelslike_c": 24.2,
-            "feelslike_f": 75.6,
-            "uv": 5
-        },
-        "forecast": {
-            "forecastday": [
-                {
-                    "date": current_date.strftime("%Y-%m-%d"),
-                    "day": {
-                        "maxtemp_c": 25.6,
-                        "maxtemp_f": 78.1,
-                        "mintemp_c": 16.3,
-                        "mintemp_f": 61.3,
-                        "condition": {
-                            "text": "Partly cloudy",
-                        },
-                        "daily_chance_of_rain": 20
-                    },
-                    "hour": [
-                        {"time": f"{current_date.strftime('%Y-%m-%d')} 00:00", "temp_c": 18.2, "temp_f": 64.8, "condition": {"text": "Clear"}},
-                        {"time": f"{current_date.strftime('%Y-%m-%d')} 03:00", "temp_c": 17.0, "temp_f": 62.6, "condition": {"text": "Clear"}},
-                        {"time": f"{current_date.strftime('%Y-%m-%d')} 06:00", "temp_c": 16.8, "temp_f": 62.2, "condition": {"text": "Clear"}},
-                        {"time": f"{current_date.strftime('%Y-%m-%d')} 09:00", "temp_c": 19.5, "temp_f": 67.1, "condition": {"text": "Sunny"}},
-                        {"time": f"{current_date.strftime('%Y-%m-%d')} 12:00", "temp_c": 22.8, "temp_f": 73.0, "condition": {"text": "Sunny"}},
-                        {"time": f"{current_date.strftime('%Y-%m-%d')} 15:00", "temp_c": 25.1, "temp_f": 77.2, "condition": {"text": "Partly cloudy"}},
-                        {"time": f"{current_date.strftime('%Y-%m-%d')} 18:00", "temp_c": 23.4, "temp_f": 74.1, "condition": {"text": "Partly cloudy"}},
-                        {"time": f"{current_date.strftime('%Y-%m-%d')} 21:00", "temp_c": 20.1, "temp_f": 68.2, "condition": {"text": "Clear"}}
-                    ]
-                },
-                {
-                    "date": (current_date + timedelta(days=1)).strftime("%Y-%m-%d"),
-                    "day": {
-                        "maxtemp_c": 27.2,
-                        "maxtemp_f": 81.0,
-                        "mintemp_c": 17.8,
-                        "mintemp_f": 64.0,
-                        "condition": {
-                            "text": "Sunny",
-                        },
-                        "daily_chance_of_rain": 0
-                    }
-                },
-                {
-                    "date": (current_date + timedelta(days=2)).strftime("%Y-%m-%d"),
-                    "day": {
-                        "maxtemp_c": 26.5,
-                        "maxtemp_f": 79.7,
-                        "mintemp_c": 18.1,
-                        "mintemp_f": 64.6,
-                        "condition": {
-                            "text": "Light rain",
-                        },
-                        "daily_chance_of_rain": 70
-                    }
-                },
-                {
-                    "date": (current_date + timedelta(days=3)).strftime("%Y-%m-%d"),
-                    "day": {
-                        "maxtemp_c": 23.0,
-                        "maxtemp_f": 73.4,
-                        "mintemp_c": 16.5,
-                        "mintemp_f": 61.7,
-                        "condition": {
-                            "text": "Rain",
-                        },
-                        "daily_chance_of_rain": 90
-                    }
-                },
-                {
-                    "date": (current_date + timedelta(days=4)).strftime("%Y-%m-%d"),
-                    "day": {
-                        "maxtemp_c": 20.8,
-                        "maxtemp_f": 69.4,
-                        "mintemp_c": 15.7,
-                        "mintemp_f": 60.3,
-                        "condition": {
-                            "text": "Cloudy",
-                        },
-                        "daily_chance_of_rain": 40
-                    }
-                }
-            ]
-        }
-    }
-    
-    # Simulate API delay
-    time.sleep(0.5)
-    return mock_data
 
 # Define the modal dialog for location input first
 class LocationInputModal(ModalScreen):
@@ -257,25 +1452,53 @@ class LocationInputModal(ModalScreen):
             Static("- UK Postcode (e.g., SW1)"),
             Static("- Latitude, Longitude (e.g., 40.7128,-74.0060)"),
             Input(placeholder="Enter location", id="location_input"),
+            OptionList(id="suggestions"),
             Button("Get Weather", id="submit"),
             id="dialog-container"
         )
     
+    BINDINGS = [("down", "focus_suggestions", "Suggestions")]
+    
     def on_mount(self):
+        self.gazetteer = open_gazetteer()
+        self.suggestions = []
+        self.query_one("#suggestions").display = False
         # Focus the input field
         self.query_one("#location_input").focus()
     
+    def on_input_changed(self, event):
+        """Suggest places from the offline gazetteer as the user types"""
+        self.suggestions = self.gazetteer.suggest(event.value) if self.gazetteer else []
+        option_list = self.query_one("#suggestions")
+        option_list.clear_options()
+        option_list.add_options([place.label for place in self.suggestions])
+        option_list.display = bool(self.suggestions)
+    
+    def action_focus_suggestions(self):
+        if self.suggestions:
+            self.query_one("#suggestions").focus()
+    
+    def on_option_list_option_selected(self, event):
+        self.dismiss()
+        self.dashboard.load_place(self.suggestions[event.option_index])
+    
     def on_button_pressed(self, event):
         if event.button.id == "submit":
-            location = self.query_one("#location_input").value
-            if location:
-                self.dismiss()
-                self.dashboard.update_location(location)
+            self.submit(self.query_one("#location_input").value)
     
     def on_input_submitted(self, event):
-        location = event.value
-        if location:
-            self.dismiss()
+        self.submit(event.value)
+    
+    def submit(self, location):
+        if not location:
+            return
+        self.dismiss()
+        # A name the gazetteer knows goes straight to its coordinates; anything else
+        # (postcodes, coordinates, unknown places) is left for the API to resolve
+        place = self.gazetteer.lookup(location) if self.gazetteer else None
+        if place is not None:
+            self.dashboard.load_place(place)
+        else:
             self.dashboard.update_location(location)
 
 class LocationInput(Static):
@@ -290,7 +1513,7 @@ class LocationInput(Static):
     def update_location(self):
         """Update the location display"""
         try:
-            location_text = self.app.current_location if hasattr(self.app, 'current_location') else "Unknown"
+            location_text = self.app.location_label(self.app.current_location) if hasattr(self.app, 'current_location') else "Unknown"
             self.update(Panel(f"📍 Current location: [b]{location_text}[/b]\nPress 's' to change location", title="Location"))
         except Exception as e:
             self.update(Panel("Error showing location", title="Location"))
@@ -303,192 +1526,428 @@ class LocationInput(Static):
         """React to location changes in the dashboard"""
         self.update_location()
 
+# Rendered panels, reused when the same data is shown again in the same unit and width
+PANEL_CACHE_SIZE = 64
+
+class PanelCache:
+    """LRU cache of Rich panels; only used from the event loop, so no lock"""
+    
+    def __init__(self, max_entries=PANEL_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._panels = OrderedDict()
+    
+    def get(self, key, build):
+        """Return the panel stored for key, building and storing it on a miss"""
+        panel = self._panels.get(key)
+        if panel is not None:
+            self.hits += 1
+            self._panels.move_to_end(key)
+            return panel
+        
+        self.misses += 1
+        panel = self._panels[key] = build()
+        while len(self._panels) > self.max_entries:
+            self._panels.popitem(last=False)
+        return panel
+    
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._panels),
+            "max_entries": self.max_entries,
+        }
+
+panel_cache = PanelCache()
+
+def cached_panel(widget, *extra):
+    """Build a weather widget's panel, or reuse it for the same (data version, unit, width)
+    
+    extra is anything else the panel depends on, like the hour for the hourly forecast.
+    """
+    report = widget.weather_data
+    if not report:
+        return widget._make_panel()
+    key = (type(widget).__name__, report.version, widget.use_celsius, widget.size.width, widget.status) + extra
+    
+    def build():
+        with latency.span(f"render.{type(widget).__name__}"):
+            return widget._make_panel()
+    return panel_cache.get(key, build)
+
 class CurrentWeather(Static):
     """Widget to display current weather conditions"""
     weather_data = reactive(None)
     use_celsius = reactive(True)
+    status = reactive("")  # Shown while a fetch is in flight
     
     def watch_weather_data(self, weather_data):
         """React to changes in weather data"""
-        self.update(self._make_panel())
+        self.update(cached_panel(self))
         
     def watch_use_celsius(self, use_celsius):
         """React to temperature unit changes"""
-        self.update(self._make_panel())
+        self.update(cached_panel(self))
+    
+    def watch_status(self, status):
+        """React to loading state changes"""
+        self.update(cached_panel(self))
     
     def _make_panel(self):
         """Create a panel with current weather information"""
-        if not self.weather_data:
-            return Panel("Loading weather data...")
+        report = self.weather_data
+        if not report:
+            return Panel(self.status or "Loading weather data...")
         
-        try:
-            current = self.weather_data["current"]
-            location = self.weather_data["location"]
-            
-            # Debug print to see what's in the location data
-            print(f"Current weather location data: {location}")
-            
-            condition_text = current["condition"]["text"]
-            emoji = get_emoji_for_condition(condition_text)
-            
-            # Choose temperature unit
-            temp = f"{current['temp_c']}°C" if self.use_celsius else f"{current['temp_f']}°F"
-            feels_like = f"{current['feelslike_c']}°C" if self.use_celsius else f"{current['feelslike_f']}°F"
-            
-            # Format location string based on available data
-            location_str = location['name']
-            
-            if location.get('region') and location['region'].strip():
-                location_str += f", {location['region']}"
-                
-            if location.get('country') and location['country'].strip():
-                location_str += f", {location['country']}"
-            
-            current_info = Text.from_markup(f"""
-[bold]{location_str}[/bold]
-🕒 Local time: {location['localtime']}
-
-{emoji} [bold]{condition_text}[/bold]
-
-🌡️ Temperature: {temp}
-🧥 Feels like: {feels_like}
-💧 Humidity: {current['humidity']}%
-💨 Wind: {current['wind_kph']} km/h {current['wind_dir']}
-🧭 Pressure: {current['pressure_mb']} mb
-☀️ UV Index: {current['uv']}
+        current = report.current
+        current_info = Text.from_markup(f"""
+[bold]{report.display_name}[/bold]
+🕒 Local time: {report.localtime}
+
+{current.emoji} [bold]{current.condition}[/bold]
+
+🌡️ Temperature: {pick_unit(current.temp, self.use_celsius)}
+🧥 Feels like: {pick_unit(current.feels_like, self.use_celsius)}
+💧 Humidity: {current.humidity}
+💨 Wind: {current.wind}
+🧭 Pressure: {current.pressure}
+☀️ UV Index: {current.uv}
             """)
-            
-            unit_text = "°C" if self.use_celsius else "°F"
-            return Panel(current_info, title=f"Current Weather ({unit_text})", border_style="blue")
-        except (KeyError, IndexError) as e:
-            # Graceful error handling
-            return Panel(f"Unable to display current weather: {str(e)}", title="Current Weather", border_style="blue")
+        
+        unit_text = "°C" if self.use_celsius else "°F"
+        return Panel(current_info, title=f"Current Weather ({unit_text})", subtitle=self.status or None, border_style="blue")
+
+class ForecastWidget(Static):
+    """Widget to display forecast information"""
+    weather_data = reactive(None)
+    use_celsius = reactive(True)
+    status = reactive("")  # Shown while a fetch is in flight
+    
+    def watch_weather_data(self, weather_data):
+        """React to changes in weather data"""
+        self.update(cached_panel(self))
+        
+    def watch_use_celsius(self, use_celsius):
+        """React to temperature unit changes"""
+        self.update(cached_panel(self))
+    
+    def watch_status(self, status):
+        """React to loading state changes"""
+        self.update(cached_panel(self))
+    
+    def _make_panel(self):
+        """Create a panel with forecast information"""
+        report = self.weather_data
+        if not report:
+            return Panel(self.status or "Loading forecast data...")
+        
+        table = Table(box=box.SIMPLE)
+        table.add_column("Date")
+        table.add_column("Condition")
+        table.add_column("High")
+        table.add_column("Low")
+        table.add_column("Rain")
+        
+        for day in report.days:
+            table.add_row(
+                day.date,
+                f"{day.emoji} {day.condition}",
+                pick_unit(day.high, self.use_celsius),
+                pick_unit(day.low, self.use_celsius),
+                day.rain
+            )
+        
+        unit_text = "°C" if self.use_celsius else "°F"
+        return Panel(table, title=f"{len(report.days)}-Day Forecast ({unit_text})", subtitle=self.status or None, border_style="green")
+
+class HourlyForecastWidget(Static):
+    """Widget to display hourly forecast information for the current day"""
+    weather_data = reactive(None)
+    use_celsius = reactive(True)
+    status = reactive("")  # Shown while a fetch is in flight
+    
+    def watch_weather_data(self, weather_data):
+        """React to changes in weather data"""
+        self.update(cached_panel(self, datetime.now().hour))
+        
+    def watch_use_celsius(self, use_celsius):
+        """React to temperature unit changes"""
+        self.update(cached_panel(self, datetime.now().hour))
+    
+    def watch_status(self, status):
+        """React to loading state changes"""
+        self.update(cached_panel(self, datetime.now().hour))
+    
+    def _make_panel(self):
+        """Create a panel with hourly forecast information"""
+        report = self.weather_data
+        if not report:
+            return Panel(self.status or "Loading hourly forecast data...")
+        
+        # Only show future hours or a selection of hours throughout the day
+        current_hour = datetime.now().hour
+        
+        # Select hours to display
+        selected_hours = report.hours[current_hour::3]  # Every 3 hours from current hour
+        if len(selected_hours) < 3:
+            selected_hours = report.hours[::3][:8]  # Just take 8 entries, every 3 hours
+        
+        table = Table(box=box.SIMPLE)
+        table.add_column("Time")
+        table.add_column("Temp")
+        table.add_column("Condition")
+        
+        for hour in selected_hours:
+            table.add_row(
+                hour.time,
+                pick_unit(hour.temp, self.use_celsius),
+                f"{hour.emoji} {hour.condition}"
+            )
+        
+        unit_text = "°C" if self.use_celsius else "°F"
+        return Panel(table, title=f"Hourly Forecast ({unit_text})", subtitle=self.status or None, border_style="yellow")
 
-class ForecastWidget(Static):
-    """Widget to display forecast information"""
+SPARK_BLOCKS = "▁▂▃▄▅▆▇█"
+TREND_RANGES = (1, 7, 30)  # Days the trend widget can show; 't' cycles through them
+
+def sparkline(values, low=None, high=None):
+    """One block character per value, scaled between low and high; gaps (None) stay blank"""
+    present = [value for value in values if value is not None]
+    if not present:
+        return " " * len(values)
+    low = min(present) if low is None else low
+    high = max(present) if high is None else high
+    span = (high - low) or 1
+    top = len(SPARK_BLOCKS) - 1
+    return "".join(
+        " " if value is None else SPARK_BLOCKS[max(0, min(top, round((value - low) / span * top)))]
+        for value in values
+    )
+
+class TrendWidget(Static):
+    """Widget with temperature and precipitation sparklines from the local history"""
     weather_data = reactive(None)
     use_celsius = reactive(True)
+    status = reactive("")  # Shown while a fetch is in flight
+    days = reactive(TREND_RANGES[0])
     
     def watch_weather_data(self, weather_data):
         """React to changes in weather data"""
-        self.update(self._make_panel())
-        
+        self.update(cached_panel(self, self.days))
+    
     def watch_use_celsius(self, use_celsius):
         """React to temperature unit changes"""
-        self.update(self._make_panel())
+        self.update(cached_panel(self, self.days))
+    
+    def watch_status(self, status):
+        """React to loading state changes"""
+        self.update(cached_panel(self, self.days))
+    
+    def watch_days(self, days):
+        """React to a different time range"""
+        self.update(cached_panel(self, self.days))
     
     def _make_panel(self):
-        """Create a panel with forecast information"""
+        """Create a panel with sparklines over the last self.days days"""
+        title = f"Trend, last {self.days} day{'s' if self.days != 1 else ''}"
         if not self.weather_data:
-            return Panel("Loading forecast data...")
+            return Panel(self.status or "Loading history...", title=title, border_style="cyan")
         
-        try:
-            forecast_days = self.weather_data["forecast"]["forecastday"]
-            
-            table = Table(box=box.SIMPLE)
-            table.add_column("Date")
-            table.add_column("Condition")
-            table.add_column("High")
-            table.add_column("Low")
-            table.add_column("Rain")
-            
-            for day in forecast_days:
-                try:
-                    date = datetime.strptime(day["date"], "%Y-%m-%d").strftime("%a, %b %d")
-                    condition = day["day"]["condition"]["text"]
-                    emoji = get_emoji_for_condition(condition)
-                    
-                    # Choose temperature unit
-                    high = f"{day['day']['maxtemp_c']}°C" if self.use_celsius else f"{day['day']['maxtemp_f']}°F"
-                    low = f"{day['day']['mintemp_c']}°C" if self.use_celsius else f"{day['day']['mintemp_f']}°F"
-                    
-                    rain_chance = f"{day['day']['daily_chance_of_rain']}%"
-                    
-                    table.add_row(
-                        date,
-                        f"{emoji} {condition}",
-                        high,
-                        low,
-                        rain_chance
-                    )
-                except (KeyError, ValueError) as e:
-                    # Skip problematic days
-                    continue
-            
-            unit_text = "°C" if self.use_celsius else "°F"
-            return Panel(table, title=f"5-Day Forecast ({unit_text})", border_style="green")
-        except (KeyError, IndexError) as e:
-            # Graceful error handling
-            return Panel(f"Unable to display forecast: {str(e)}", title="5-Day Forecast", border_style="green")
+        width = max(10, self.size.width - 22)
+        until = time.time()
+        # The key the data was recorded under; current_location may since have become "Name, Country"
+        temps, precip = history.series(self.weather_data.location_key, until - self.days * 86400, until, width)
+        present = [temp for temp in temps if temp is not None]
+        if not present:
+            return Panel("No history yet; it builds up as weather is fetched.", title=title, subtitle=self.status or None, border_style="cyan")
+        
+        low, high = min(present), max(present)
+        if not self.use_celsius:
+            low, high = low * 9 / 5 + 32, high * 9 / 5 + 32
+        unit = "°C" if self.use_celsius else "°F"
+        rain = [value for value in precip if value is not None]
+        body = Text.from_markup(
+            f"🌡️ [bold]{sparkline(temps)}[/bold] {low:.0f}–{high:.0f}{unit}\n"
+            f"💧 [blue]{sparkline(precip, low=0)}[/blue] max {max(rain) if rain else 0:.1f} mm"
+        )
+        return Panel(body, title=title, subtitle=self.status or None, border_style="cyan")
 
-class HourlyForecastWidget(Static):
-    """Widget to display hourly forecast information for the current day"""
-    weather_data = reactive(None)
+# Columns of the extended forecast: heading, width in terminal cells
+EXTENDED_COLUMNS = (("Day", 8), ("Time", 7), ("Temp", 9), ("Feels like", 11), ("Condition", 30), ("Rain", 6), ("Wind", 16))
+
+class ExtendedForecastView(ScrollView):
+    """Every forecast hour in one scrollable table
+    
+    Only the rows on screen are ever turned into strips (render_line), and those strips are
+    kept per unit, so scrolling and toggling units cost the same for 24 rows or 336.
+    """
+    DEFAULT_CSS = """
+    ExtendedForecastView {
+        height: 1fr;
+    }
+    """
+    
     use_celsius = reactive(True)
     
-    def watch_weather_data(self, weather_data):
-        """React to changes in weather data"""
-        self.update(self._make_panel())
-        
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.report = None
+        self._strips = {}  # (row, use_celsius) -> Strip covering the full table width
+        self._table_width = sum(width for _, width in EXTENDED_COLUMNS)
+        self._header = self._make_strip([heading for heading, _ in EXTENDED_COLUMNS], Style(bold=True, underline=True))
+    
+    def set_report(self, report):
+        self.report = report
+        self._strips.clear()
+        rows = len(report.all_hours) if report else 0
+        self.virtual_size = Size(self._table_width, rows + 1)  # +1 for the header
+        self.refresh()
+    
+    def watch_use_celsius(self, use_celsius):
+        self.refresh()
+    
+    def _make_strip(self, cells, style=None):
+        segments = []
+        for text, (_, width) in zip(cells, EXTENDED_COLUMNS):
+            segments.append(Segment(set_cell_size(text, width - 1) + " ", style))
+        return Strip(segments, self._table_width)
+    
+    def _row_strip(self, row):
+        key = (row, self.use_celsius)
+        strip = self._strips.get(key)
+        if strip is None:
+            hour = self.report.all_hours[row]
+            strip = self._strips[key] = self._make_strip((
+                hour.day,
+                hour.time,
+                pick_unit(hour.temp, self.use_celsius),
+                pick_unit(hour.feels_like, self.use_celsius),
+                f"{hour.emoji} {hour.condition}",
+                hour.rain,
+                hour.wind,
+            ))
+        return strip
+    
+    def render_line(self, y):
+        scroll_x, scroll_y = self.scroll_offset
+        width = self.size.width
+        if y == 0:
+            strip = self._header  # Stays put while the rows scroll under it
+        else:
+            row = scroll_y + y - 1
+            if self.report is None or row >= len(self.report.all_hours):
+                return Strip.blank(width)
+            strip = self._row_strip(row)
+        return strip.crop(scroll_x, scroll_x + width).extend_cell_length(width)
+
+class FavoritesGrid(Static):
+    """Widget showing current conditions for every favorite location, one row each"""
+    use_celsius = reactive(True)
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.locations = []
+        self.rows = {}  # location -> weather data, or an error string
+        self._render_pending = False
+    
+    def set_locations(self, locations):
+        """Start over with a new list of locations, all shown as loading"""
+        self.locations = list(locations)
+        self.rows = {}
+        self.schedule_render()
+    
+    def set_row(self, location, result):
+        """Fill in one location as soon as its result (a WeatherReport or an error) arrives"""
+        self.rows[location] = result
+        self.schedule_render()
+    
+    def schedule_render(self):
+        """Rebuild the table once per screen refresh, however many rows arrived meanwhile"""
+        if not self._render_pending:
+            self._render_pending = True
+            self.call_after_refresh(self._render_rows)
+    
     def watch_use_celsius(self, use_celsius):
         """React to temperature unit changes"""
+        self.schedule_render()
+    
+    def _render_rows(self):
+        self._render_pending = False
         self.update(self._make_panel())
     
     def _make_panel(self):
-        """Create a panel with hourly forecast information"""
-        if not self.weather_data:
-            return Panel("Loading hourly forecast data...")
+        """Create a panel with one row per favorite location"""
+        if not self.locations:
+            return Panel("No favorites yet. Press 'a' to add the current location.", title="Favorites", border_style="magenta")
         
-        try:
-            hours = self.weather_data["forecast"]["forecastday"][0]["hour"]
-            
-            # Only show future hours or a selection of hours throughout the day
-            current_hour = datetime.now().hour
-            
-            # Select hours to display
-            try:
-                selected_hours = hours[current_hour::3]  # Every 3 hours from current hour
-                if len(selected_hours) < 3:
-                    selected_hours = hours[::3][:8]  # Just take 8 entries, every 3 hours
-            except IndexError:
-                # Fallback if there's an issue with the selection
-                selected_hours = hours[::3][:3]  # Take first few entries
-            
-            table = Table(box=box.SIMPLE)
-            table.add_column("Time")
-            table.add_column("Temp")
-            table.add_column("Condition")
-            
-            for hour in selected_hours:
-                try:
-                    # Try to parse time in format "YYYY-MM-DD HH:MM"
-                    if " " in hour["time"]:
-                        time_str = hour["time"].split(" ")[1]
-                    else:
-                        # Fallback if the time format is unexpected
-                        time_str = hour["time"]
-                    
-                    # Choose temperature unit
-                    temp = f"{hour['temp_c']}°C" if self.use_celsius else f"{hour['temp_f']}°F"
-                    
-                    condition = hour["condition"]["text"]
-                    emoji = get_emoji_for_condition(condition)
-                    
-                    table.add_row(
-                        time_str,
-                        temp,
-                        f"{emoji} {condition}"
-                    )
-                except (KeyError, IndexError) as e:
-                    # Skip problematic entries
-                    continue
-            
-            unit_text = "°C" if self.use_celsius else "°F"
-            return Panel(table, title=f"Hourly Forecast ({unit_text})", border_style="yellow")
-            
-        except (KeyError, IndexError) as e:
-            # Graceful error handling
-            return Panel(f"Unable to display hourly forecast: {str(e)}", title="Hourly Forecast", border_style="yellow")
+        table = Table(box=box.SIMPLE, expand=True)
+        table.add_column("Location")
+        table.add_column("Condition")
+        table.add_column("Temp")
+        table.add_column("Feels like")
+        table.add_column("Humidity")
+        table.add_column("Wind")
+        
+        now = time.time()
+        for location in self.locations:
+            result = self.rows.get(location)
+            label = self.app.location_label(location)
+            if result is None:
+                table.add_row(label, "[dim]⏳ Loading...[/dim]", "", "", "", "")
+            elif isinstance(result, str):
+                table.add_row(label, f"[red]{result}[/red]", "", "", "", "")
+            else:
+                current = result.current
+                table.add_row(
+                    f"{label} [yellow]⚠[/yellow]" if is_stale(result, now) else label,
+                    f"{current.emoji} {current.condition}",
+                    pick_unit(current.temp, self.use_celsius),
+                    pick_unit(current.feels_like, self.use_celsius),
+                    current.humidity,
+                    current.wind
+                )
+        
+        loaded = len(self.rows)
+        subtitle = f"{loaded}/{len(self.locations)} loaded" if loaded < len(self.locations) else None
+        return Panel(table, title=f"Favorites ({len(self.locations)})", subtitle=subtitle, border_style="magenta")
+
+class DebugPanel(Static):
+    """Internal statistics, toggled with 'i'"""
+    
+    def on_mount(self):
+        self.refresh_stats()
+        self.set_interval(1.0, self.refresh_stats)
+    
+    def refresh_stats(self):
+        if not self.display:
+            return
+        stats = panel_cache.stats()
+        table = Table(box=box.SIMPLE, show_header=False)
+        table.add_column("Stat")
+        table.add_column("Value", justify="right")
+        table.add_row("Panel cache hits", str(stats["hits"]))
+        table.add_row("Panel cache misses", str(stats["misses"]))
+        table.add_row("Panel cache hit rate", f"{stats['hit_rate']:.0%}")
+        table.add_row("Panel cache entries", f"{stats['entries']}/{stats['max_entries']}")
+        table.add_row("Fetches in flight", str(request_coordinator.in_flight()))
+        for name, seconds in startup_timings.items():
+            table.add_row(f"Startup: {name}", f"{seconds * 1000:.0f} ms")
+        
+        spans = Table(box=box.SIMPLE)
+        spans.add_column("Span")
+        for column in ("Count", "p50", "p90", "p99", "Max"):
+            spans.add_column(column, justify="right")
+        for name, summary in latency.snapshot().items():
+            spans.add_row(
+                name,
+                str(summary["count"]),
+                *(f"{summary[stat] * 1000:.2f} ms" for stat in ("p50", "p90", "p99", "max"))
+            )
+        self.update(Panel(Group(table, spans), title="Debug ('x' exports timings)", border_style="red"))
 
 class WeatherDashboard(App):
     """Main Weather Dashboard Application"""
@@ -497,6 +1956,13 @@ class WeatherDashboard(App):
         ("s", "location_search", "Search Location"),
         ("r", "refresh", "Refresh"),
         ("u", "toggle_units", "Toggle °C/°F"),
+        ("f", "toggle_favorites", "Favorites"),
+        ("e", "toggle_extended", "Extended Forecast"),
+        ("a", "add_favorite", "Add Favorite"),
+        ("d", "remove_favorite", "Remove Favorite"),
+        ("t", "trend_range", "Trend Range"),
+        ("i", "toggle_debug", "Debug"),
+        ("x", "export_timings", "Export Timings"),
         ("q", "quit", "Quit")
     ]
     
@@ -504,9 +1970,19 @@ class WeatherDashboard(App):
         self.weather_data = None
         self.current_location = "London, UK"  # Default location
         self.use_celsius = True  # Default to Celsius
+        self.refresh_debounce = REFRESH_DEBOUNCE
+        self._last_refresh = (None, 0.0)  # (normalized location, monotonic time)
+        self.favorites = load_favorites()
+        self.favorites_concurrency = FAVORITES_CONCURRENCY
+        self.show_favorites = False
+        self.location_labels = {}  # Coordinate queries picked from the gazetteer -> place names
+        self.background_refresh = True
+        self.scheduler = RefreshScheduler()
+        self._refreshing = set()  # Locations with a background refresh in flight
+        self.snapshot = None  # Report painted from the cache at startup, until fresher data replaces it
         super().__init__(*args, **kwargs)
         self.title = "Weather Dashboard"
-        self.sub_title = "Press 's' to search, 'r' to refresh, 'u' to toggle units, 'q' to quit"
+        self.sub_title = "Press 's' to search, 'r' to refresh, 'u' to toggle units, 'f' for favorites, 'q' to quit"
     
     async def on_mount(self) -> None:
         """Set up the application layout"""
@@ -516,148 +1992,444 @@ class WeatherDashboard(App):
             self.current_weather = CurrentWeather()
             self.forecast = ForecastWidget()
             self.hourly = HourlyForecastWidget()
+            self.trends = TrendWidget()
+            self.favorites_grid = FavoritesGrid()
+            self.debug_panel = DebugPanel()
+            self.debug_panel.display = False
             
             # Create main container with all weather widgets
-            main_container = Container(
+            self.main_container = Container(
                 self.location_input,
                 self.current_weather,
                 self.forecast,
-                self.hourly
+                self.hourly,
+                self.trends
             )
+            self.favorites_container = Container(self.favorites_grid)
+            self.extended_title = Static()
+            self.extended = ExtendedForecastView()
+            self.extended_container = Container(self.extended_title, self.extended)
+            self.extended_container.display = False
             
             # Mount the widgets to the app
             await self.mount(Header())
-            await self.mount(main_container)
+            await self.mount(self.main_container)
+            await self.mount(self.favorites_container)
+            await self.mount(self.extended_container)
+            await self.mount(self.debug_panel)
             await self.mount(Footer())
             
-            # Load initial weather data
-            self.load_location(self.current_location)
+            # Load initial weather data; whatever is in the cache is painted right away
+            if self.show_favorites:
+                self.main_container.display = False
+                self.load_favorites()
+            else:
+                self.favorites_container.display = False
+                self.warm_start(self.current_location)
+            record_startup_milestone("ui_ready")
+            
+            if self.background_refresh:
+                self.set_interval(REFRESH_TICK, self.check_refreshes)
         except Exception as e:
             # Fallback if there's an issue during initialization
             error_widget = Static(f"Error initializing application: {str(e)}")
             await self.mount(error_widget)
     
+    class WeatherLoaded(Message):
+        """Posted by the fetch worker when weather data has arrived, already parsed into a WeatherReport"""
+        def __init__(self, location, data, search):
+            super().__init__()
+            self.location = location
+            self.data = data
+            self.search = search
+    
+    class WeatherFailed(Message):
+        """Posted by the fetch worker when a fetch failed"""
+        def __init__(self, location, error, search):
+            super().__init__()
+            self.location = location
+            self.error = error
+            self.search = search
+    
+    class ExtendedLoaded(Message):
+        """Posted by the extended forecast worker with the long forecast for a location"""
+        def __init__(self, location, data):
+            super().__init__()
+            self.location = location
+            self.data = data
+    
+    class FavoriteLoaded(Message):
+        """Posted by the favorites worker for each location as its data arrives"""
+        def __init__(self, location, data):
+            super().__init__()
+            self.location = location
+            self.data = data
+    
+    class FavoriteFailed(Message):
+        """Posted by the favorites worker when one location could not be fetched"""
+        def __init__(self, location, error):
+            super().__init__()
+            self.location = location
+            self.error = error
+    
+    class RefreshLoaded(Message):
+        """Posted by a background refresh with fresh data for a shown location"""
+        def __init__(self, location, data):
+            super().__init__()
+            self.location = location
+            self.data = data
+    
+    class RefreshFailed(Message):
+        """Posted when a background refresh failed; the old data stays up"""
+        def __init__(self, location, error):
+            super().__init__()
+            self.location = location
+            self.error = error
+    
+    class LocationChanged(Message):
+        """Event sent when location changes"""
+        def __init__(self, old, new):
+            super().__init__()
+            self.old = old
+            self.new = new
+    
+    def location_label(self, location):
+        """Name to show for a location; coordinates from the gazetteer show the place name"""
+        return self.location_labels.get(location, location)
+    
+    def load_place(self, place):
+        """Show a place picked from the gazetteer, fetched by its canonical coordinates"""
+        self.location_labels[place.query] = place.label
+        self.load_location(place.query)
+        if hasattr(self, 'location_input'):
+            self.location_input.update_location()
+    
     def load_location(self, location):
         """Process a new location entered by the user"""
         if not location:
             return
-            
-        print(f"Loading weather for: {location}")
         
         # Update the location display first
-        old_location = self.current_location
         self.current_location = location
         
         # Update app title
-        self.title = f"Weather Dashboard - {location}"
+        self.title = f"Weather Dashboard - {self.location_label(location)}"
         
-        # Now load the weather data
-        try:
-            # Get the weather data
-            self.weather_data = get_weather_data(location)
-            
-            # Update widgets with new data
-            if hasattr(self, 'current_weather'):
-                self.current_weather.weather_data = self.weather_data
-            if hasattr(self, 'forecast'):
-                self.forecast.weather_data = self.weather_data
-            if hasattr(self, 'hourly'):
-                self.hourly.weather_data = self.weather_data
-            
-            # Show success notification
-            self.notify(f"Weather updated for {location}")
-            
-            # Force update of location display
-            if hasattr(self, 'location_input'):
-                self.location_input.update_location()
-                
-        except Exception as e:
-            # Log the error but don't crash
-            print(f"Error loading weather data: {str(e)}")
-            self.notify(f"Error: Could not load weather for {location}", severity="error")
+        # Now load the weather data in the background
+        self.fetch_weather(location)
+    
+    def warm_start(self, location):
+        """Show the last cached snapshot immediately and refresh it in the background"""
+        snapshot = load_snapshot(location)
+        if snapshot is None:
+            self.load_location(location)
+            return
+        
+        self.title = f"Weather Dashboard - {self.location_label(location)}"
+        self.snapshot = snapshot
+        self.show_report(snapshot)
+        if is_stale(snapshot):
+            self.set_loading(f"⏳ Refreshing, showing data from {format_fetched_at(snapshot.fetched_at)}")
+            self._fetch_worker(location, False)
+        else:
+            self.scheduler.succeeded(location, snapshot.fetched_at)
     
     def load_weather_data(self, location):
         """Load weather data for a given location"""
-        try:
-            # Update the title immediately
-            self.title = f"Weather Dashboard - {location}"
-            
-            # Show a notification that we're loading
-            self.notify(f"Loading weather data for {location}")
-            
-            # Get weather data
-            weather_data = get_weather_data(location)
-            
-            # Update the stored data
-            self.weather_data = weather_data
-            
-            # Update the widgets with new data
-            if hasattr(self, 'current_weather'):
-                self.current_weather.weather_data = weather_data
-            
-            if hasattr(self, 'forecast'):  
-                self.forecast.weather_data = weather_data
-                
-            if hasattr(self, 'hourly'):
-                self.hourly.weather_data = weather_data
-            
-            # Force redraw
-            self.refresh()
-            
-            # Show success notification
-            self.notify(f"Weather updated for {location}")
-            
-        except Exception as e:
-            # Log the error but don't crash
-            print(f"Error loading weather data: {str(e)}")
-            self.notify(f"Error: {str(e)}", severity="error")
-    
-    class LocationChanged(Message):
-        """Event sent when location changes"""
-        def __init__(self, old, new):
-            super().__init__()
-            self.old = old
-            self.new = new
+        # Update the title immediately
+        self.title = f"Weather Dashboard - {location}"
+        
+        # Show a notification that we're loading
+        self.notify(f"Loading weather data for {location}")
+        
+        self.fetch_weather(location)
     
     def update_location(self, location):
         """Update the location and refresh weather data"""
         # Show loading notification
         self.notify(f"Searching for location: {location}...")
         
+        # The API validates the location; the result arrives as a WeatherLoaded message
+        self.fetch_weather(location, search=True)
+    
+    def set_loading(self, status):
+        """Show (or clear, with "") the loading state in every weather widget"""
+        for name in ("current_weather", "forecast", "hourly", "trends"):
+            if hasattr(self, name):
+                getattr(self, name).status = status
+    
+    def fetch_weather(self, location, search=False):
+        """Start fetching weather in the background; a newer fetch cancels this one"""
+        self.set_loading(f"⏳ Loading {location}...")
+        self._fetch_worker(location, search)
+    
+    @work(thread=True, exclusive=True, group="weather")
+    def _fetch_worker(self, location, search):
+        """Runs in a worker thread so the UI keeps responding during the request"""
+        worker = get_current_worker()
         try:
-            # Try to get weather data (this will validate the location via API)
-            weather_data = get_weather_data(location)
-            
-            # Extract the properly formatted location from the API response
-            formatted_location = f"{weather_data['location']['name']}, {weather_data['location']['country']}"
-            
-            # Update current location with properly formatted version
-            self.current_location = formatted_location
-            
-            # Update title
-            self.title = f"Weather Dashboard - {formatted_location}"
-            
-            # Save weather data
-            self.weather_data = weather_data
-            
-            # Update all widgets
-            self.current_weather.weather_data = weather_data
-            self.forecast.weather_data = weather_data
-            self.hourly.weather_data = weather_data
-            
-            # Update location display
+            # Parsing happens here too, off the event loop
+            data = load_report(location)
+        except Exception as e:
+            if not worker.is_cancelled:
+                self.post_message(self.WeatherFailed(location, str(e), search))
+            return
+        
+        # The user may have picked another location in the meantime
+        if not worker.is_cancelled:
+            self.post_message(self.WeatherLoaded(location, data, search))
+    
+    def on_weather_dashboard_weather_loaded(self, message):
+        """Show weather data that a fetch worker delivered"""
+        location = message.location
+        if message.search:
+            # Use the properly formatted location from the API response
+            location = f"{message.data.name}, {message.data.country}"
+            self.current_location = location
+            self.title = f"Weather Dashboard - {location}"
+        
+        self.show_report(message.data)
+        self.scheduler.succeeded(location, message.data.fetched_at)
+        if self.extended_container.display:
+            self.load_extended()
+        
+        # Update location display
+        if hasattr(self, 'location_input'):
             self.location_input.update_location()
-            
-            # Show confirmation
-            self.notify(f"Weather updated for {formatted_location}")
-            
+        
+        # Show confirmation
+        self.notify(f"Weather updated for {location}")
+    
+    def show_report(self, report):
+        """Put a report in every weather widget"""
+        # Save weather data
+        self.weather_data = report
+        
+        # Startup milestones are taken once the frame with this data has been drawn
+        if not is_stale(report):
+            self.call_after_refresh(record_startup_milestone, "fresh_data")
+        self.call_after_refresh(record_startup_milestone, "first_paint")
+        
+        # Update all widgets
+        self.set_loading(self.status_for(report))
+        if hasattr(self, 'current_weather'):
+            self.current_weather.weather_data = report
+        if hasattr(self, 'forecast'):
+            self.forecast.weather_data = report
+        if hasattr(self, 'hourly'):
+            self.hourly.weather_data = report
+        if hasattr(self, 'trends'):
+            self.trends.weather_data = report
+    
+    def status_for(self, report, now=None):
+        """Status line for data on screen: stale data and the startup snapshot show their time"""
+        if is_stale(report, now):
+            return stale_label(report)
+        if report is self.snapshot:
+            return f"Cached data from {format_fetched_at(report.fetched_at)}"
+        return ""
+    
+    def on_weather_dashboard_weather_failed(self, message):
+        """Report a failed fetch without touching the data on screen"""
+        self.set_loading("")
+        if message.search:
+            self.notify(f"Error: {message.error}", severity="error")
+        else:
+            self.notify(f"Error: Could not load weather for {message.location}", severity="error")
+    
+    def load_favorites(self):
+        """Fetch every favorite location in the background, at most favorites_concurrency at a time"""
+        self.favorites_grid.set_locations(self.favorites)
+        for location in self.favorites:
+            snapshot = load_snapshot(location)
+            if snapshot is not None:
+                self.favorites_grid.set_row(location, snapshot)
+        if self.favorites_grid.rows:
+            self.call_after_refresh(record_startup_milestone, "first_paint")
+        if self.favorites:
+            self._favorites_worker(list(self.favorites), self.favorites_concurrency)
+    
+    @work(thread=True, exclusive=True, group="favorites")
+    def _favorites_worker(self, locations, concurrency):
+        """Fetch favorites on a small thread pool, posting each result as soon as it is in
+        
+        Fetches go through request_coordinator, so they share the cache, the keep-alive
+        session and the rate limiter with the rest of the app.
+        """
+        worker = get_current_worker()
+        executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="favorites")
+        try:
+            futures = {executor.submit(load_report, location): location for location in locations}
+            for future in as_completed(futures):
+                # A newer load replaced this one; drop whatever has not started yet
+                if worker.is_cancelled:
+                    return
+                location = futures[future]
+                try:
+                    self.post_message(self.FavoriteLoaded(location, future.result()))
+                except Exception as e:
+                    self.post_message(self.FavoriteFailed(location, str(e)))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def on_weather_dashboard_favorite_loaded(self, message):
+        """Fill in a favorite's row"""
+        if message.location in self.favorites:
+            self.favorites_grid.set_row(message.location, message.data)
+            self.scheduler.succeeded(message.location, message.data.fetched_at)
+            if len(self.favorites_grid.rows) == len(self.favorites):
+                self.call_after_refresh(record_startup_milestone, "first_paint")
+                rows = self.favorites_grid.rows.values()
+                if all(not isinstance(row, str) and not is_stale(row) for row in rows):
+                    self.call_after_refresh(record_startup_milestone, "fresh_data")
+    
+    def on_weather_dashboard_favorite_failed(self, message):
+        """Show a favorite's error in its row"""
+        if message.location in self.favorites:
+            self.favorites_grid.set_row(message.location, message.error)
+            self.scheduler.failed(message.location)
+    
+    def check_refreshes(self):
+        """Timer callback: start background refreshes for shown locations that are due"""
+        now = time.time()
+        shown = self.favorites if self.show_favorites else [self.current_location]
+        for location in shown:
+            if location not in self._refreshing and self.scheduler.is_due(location, now):
+                self._refreshing.add(location)
+                self._refresh_worker(location)
+        
+        # Mark data that expired while its refresh is failing or still running
+        if self.show_favorites:
+            self.favorites_grid.schedule_render()
+        elif self.weather_data and not self.current_weather.status.startswith("⏳"):
+            self.set_loading(self.status_for(self.weather_data, now))
+    
+    @work(thread=True, group="refresh")
+    def _refresh_worker(self, location):
+        """Refetch one location, skipping the cache, while its old data stays on screen"""
+        try:
+            self.post_message(self.RefreshLoaded(location, load_report(location, force=True)))
         except Exception as e:
-            # Show error if location is invalid
-            error_message = str(e)
-            self.notify(f"Error: {error_message}", severity="error")
-            
-            # Log the error
-            print(f"Weather API error: {error_message}")
+            self.post_message(self.RefreshFailed(location, str(e)))
+    
+    def on_weather_dashboard_refresh_loaded(self, message):
+        """Swap in refreshed data quietly, wherever the location is still shown"""
+        self._refreshing.discard(message.location)
+        self.scheduler.succeeded(message.location, message.data.fetched_at)
+        if message.location in self.favorites:
+            self.favorites_grid.set_row(message.location, message.data)
+        if message.location == self.current_location:
+            self.show_report(message.data)
+    
+    def on_weather_dashboard_refresh_failed(self, message):
+        """Back off and keep showing the old data, marked stale once it expires"""
+        self._refreshing.discard(message.location)
+        self.scheduler.failed(message.location)
+    
+    def update_extended_title(self):
+        report = self.extended.report
+        if report is None:
+            self.extended_title.update("Loading extended forecast...")
+            return
+        self.extended_title.update(Text.from_markup(
+            f"[bold]{report.display_name}[/bold]: {len(report.all_hours)} hours over {len(report.days)} days"
+            "  [dim](arrows/PgUp/PgDn scroll, 'u' units, 'e' back)[/dim]"
+        ))
+    
+    def action_toggle_extended(self) -> None:
+        """Switch between the dashboard and every forecast hour for up to EXTENDED_DAYS days"""
+        showing = not self.extended_container.display
+        self.extended_container.display = showing
+        self.main_container.display = not showing and not self.show_favorites
+        self.favorites_container.display = not showing and self.show_favorites
+        if not showing:
+            return
+        
+        self.extended.focus()
+        self.load_extended()
+    
+    def load_extended(self):
+        """Fetch the extended forecast for the current location into the extended view"""
+        self.extended.set_report(None)
+        self.update_extended_title()
+        self._extended_worker(self.current_location)
+    
+    @work(thread=True, exclusive=True, group="extended")
+    def _extended_worker(self, location):
+        """Only hours are shown here, so forecast-aged data is good enough"""
+        worker = get_current_worker()
+        try:
+            # The long forecast is cached apart from the short one the dashboard uses
+            data = load_report(location, section="forecast", days=EXTENDED_DAYS)
+        except Exception as e:
+            if not worker.is_cancelled:
+                self.post_message(self.WeatherFailed(location, str(e), False))
+            return
+        if not worker.is_cancelled:
+            self.post_message(self.ExtendedLoaded(location, data))
+    
+    def on_weather_dashboard_extended_loaded(self, message):
+        if message.location == self.current_location:
+            self.extended.set_report(message.data)
+            self.update_extended_title()
+    
+    def action_toggle_favorites(self) -> None:
+        """Switch between the single location view and the favorites grid"""
+        self.show_favorites = not self.show_favorites
+        self.extended_container.display = False
+        self.main_container.display = not self.show_favorites
+        self.favorites_container.display = self.show_favorites
+        if self.show_favorites:
+            self.title = "Weather Dashboard - Favorites"
+            self.load_favorites()
+        else:
+            self.workers.cancel_group(self, "favorites")
+            self.title = f"Weather Dashboard - {self.location_label(self.current_location)}"
+    
+    def action_add_favorite(self) -> None:
+        """Save the current location as a favorite"""
+        location = self.current_location
+        if normalize_location(location) in {normalize_location(f) for f in self.favorites}:
+            self.notify(f"{location} is already a favorite")
+            return
+        self.favorites.append(location)
+        save_favorites(self.favorites)
+        self.notify(f"Added {location} to favorites")
+        if self.show_favorites:
+            self.load_favorites()
+    
+    def action_remove_favorite(self) -> None:
+        """Remove the current location from the favorites"""
+        key = normalize_location(self.current_location)
+        remaining = [f for f in self.favorites if normalize_location(f) != key]
+        if len(remaining) == len(self.favorites):
+            self.notify(f"{self.current_location} is not a favorite")
+            return
+        self.favorites = remaining
+        save_favorites(self.favorites)
+        self.notify(f"Removed {self.current_location} from favorites")
+        if self.show_favorites:
+            self.load_favorites()
+    
+    def action_trend_range(self) -> None:
+        """Cycle the trend sparklines through 1, 7 and 30 days"""
+        days = TREND_RANGES[(TREND_RANGES.index(self.trends.days) + 1) % len(TREND_RANGES)]
+        self.trends.days = days
+        self.notify(f"Showing trends for the last {days} day{'s' if days != 1 else ''}")
+    
+    def action_toggle_debug(self) -> None:
+        """Show or hide internal statistics"""
+        self.debug_panel.display = not self.debug_panel.display
+        self.debug_panel.refresh_stats()
+    
+    def action_export_timings(self) -> None:
+        """Save the latency histograms as JSON in the working directory"""
+        path = f"weather-timings-{datetime.now():%Y%m%d-%H%M%S}.json"
+        try:
+            latency.export(path)
+            self.notify(f"Timings saved to {path}")
+        except OSError as e:
+            self.notify(f"Could not save timings: {str(e)}", severity="error")
     
     def action_location_search(self) -> None:
         """Action handler for location search"""
@@ -676,6 +2448,12 @@ class WeatherDashboard(App):
             self.forecast.use_celsius = self.use_celsius
         if hasattr(self, 'hourly'):
             self.hourly.use_celsius = self.use_celsius
+        if hasattr(self, 'trends'):
+            self.trends.use_celsius = self.use_celsius
+        if hasattr(self, 'extended'):
+            self.extended.use_celsius = self.use_celsius
+        if hasattr(self, 'favorites_grid'):
+            self.favorites_grid.use_celsius = self.use_celsius
         
         # Show notification
         unit_text = "Celsius (°C)" if self.use_celsius else "Fahrenheit (°F)"
@@ -683,27 +2461,28 @@ class WeatherDashboard(App):
     
     def action_refresh(self):
         """Action to refresh weather data"""
+        if self.show_favorites:
+            self.load_favorites()
+            return
+        
+        # Repeated presses within the debounce window would only ask for the same data again
+        key = normalize_location(self.current_location)
+        now = time.monotonic()
+        last_key, last_time = self._last_refresh
+        if key == last_key and now - last_time < self.refresh_debounce:
+            return
+        self._last_refresh = (key, now)
+        
         self.notify("Refreshing weather data...")
         self.load_weather_data(self.current_location)
     
     def action_quit(self):
         """Action to quit the application"""
         self.exit()
-    
-    async def on_key(self, event):
-        """Directly handle key presses as a backup to the BINDINGS system"""
-        key = event.key
-        if key == "s":
-            # Directly call the action method 
-            self.action_location_search()
-        elif key == "r":
-            self.load_weather_data(self.current_location)
-        elif key == "q":
-            self.exit()
-        # Note: We're not handling 'u' here to avoid double-triggering
 
 def main():
     """Run the weather dashboard application"""
+    global CURRENT_TTL, FORECAST_TTL, FORECAST_DAYS
     parser = argparse.ArgumentParser(description="Weather Dashboard TUI Application")
     parser.add_argument(
         "-l", "--location", 
@@ -711,11 +2490,222 @@ def main():
         default="London, UK", 
         help="Default location to show weather for"
     )
+    parser.add_argument(
+        "--current-ttl",
+        type=int,
+        default=CURRENT_TTL,
+        help="Seconds cached current conditions stay fresh"
+    )
+    parser.add_argument(
+        "--forecast-ttl",
+        type=int,
+        default=FORECAST_TTL,
+        help="Seconds a cached forecast stays fresh"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always ask the API, never use or write the response cache"
+    )
+    parser.add_argument(
+        "--no-history",
+        action="store_true",
+        help="Don't record fetched observations or show trends from them"
+    )
+    parser.add_argument(
+        "--refresh-debounce",
+        type=float,
+        default=REFRESH_DEBOUNCE,
+        help="Ignore refreshes of the same location within this many seconds"
+    )
+    parser.add_argument(
+        "--no-auto-refresh",
+        action="store_true",
+        help="Only refresh when 'r' is pressed"
+    )
+    parser.add_argument(
+        "--startup-report",
+        action="store_true",
+        help="Print time to first paint and time to fresh data when the app exits"
+    )
+    parser.add_argument(
+        "--timings-out",
+        metavar="FILE",
+        help="Write the latency histograms as JSON to FILE when the app (or --batch) exits"
+    )
+    parser.add_argument(
+        "--days",
+        type=int,
+        default=FORECAST_DAYS,
+        choices=range(1, EXTENDED_DAYS + 1),
+        metavar=f"1-{EXTENDED_DAYS}",
+        help="Days of forecast to fetch ('e' switches to the extended forecast and fetches the most)"
+    )
+    parser.add_argument(
+        "--favorites",
+        action="store_true",
+        help="Start in the favorites view"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=None,
+        help=f"Locations fetched at the same time (default {FAVORITES_CONCURRENCY} for favorites, {BATCH_CONCURRENCY} for --batch)"
+    )
+    parser.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="Fetch the locations in FILE (one per line, '-' for stdin) without the UI and print one JSON line each; "
+             "exits with 1 if any location failed"
+    )
+    parser.add_argument(
+        "--build-gazetteer",
+        metavar="SOURCE",
+        help="Build the offline place index from a GeoNames cities .txt dump or a CSV of "
+             "name,region,country,lat,lon[,population], then exit; GeoNames region and country codes "
+             "become names if admin1CodesASCII.txt and countryInfo.txt are next to the dump"
+    )
+    parser.add_argument(
+        "--api-url",
+        default=API_BASE_URL,
+        help="Base URL of the weather API (or a local stand-in)"
+    )
+    parser.add_argument(
+        "--record",
+        metavar="DIR",
+        help="Save every API response to DIR as a fixture (the response cache is bypassed while recording)"
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="DIR",
+        help="Answer requests from the fixtures in DIR through a stand-in server started in the background"
+    )
+    parser.add_argument(
+        "--serve",
+        metavar="DIR",
+        help="Only run the stand-in server for the fixtures in DIR"
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=STANDIN_PORT,
+        help="Port for --serve (--replay picks a free one)"
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Milliseconds the stand-in server waits before answering"
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0.0,
+        help="Up to this many random milliseconds added to --latency"
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of stand-in requests answered with a 503"
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=None,
+        help="API calls per second allowed by your plan (default: the free plan's; "
+             "no limit against --replay or a localhost --api-url)"
+    )
+    parser.add_argument(
+        "--rate-burst",
+        type=int,
+        default=RATE_LIMIT_BURST,
+        help="API calls allowed back to back before the rate limit applies"
+    )
     args = parser.parse_args()
     
+    CURRENT_TTL = args.current_ttl
+    FORECAST_DAYS = args.days
+    FORECAST_TTL = args.forecast_ttl
+    response_cache.enabled = not args.no_cache
+    history.enabled = not args.no_history
+    weather_client.base_url = args.api_url
+    standin = bool(args.replay) or urlparse(args.api_url).hostname in ("localhost", "127.0.0.1", "::1")
+    if args.rate_limit is not None:
+        weather_client.limiter = TokenBucket(args.rate_limit, args.rate_burst)
+    elif standin:
+        weather_client.limiter = None
+    else:
+        weather_client.limiter = TokenBucket(RATE_LIMIT_PER_SECOND, args.rate_burst)
+    if standin:
+        # Stand-in data must not land in the real cache or history, and runs against it should
+        # not depend on what earlier runs left there
+        scratch = tempfile.mkdtemp(prefix="pyos-weather-standin-")
+        atexit.register(shutil.rmtree, scratch, ignore_errors=True)
+        response_cache.directory = scratch
+        history.path = os.path.join(scratch, "history.sqlite3")
+    if args.record:
+        weather_client.recorder = FixtureStore(args.record)
+        response_cache.enabled = False  # Cached locations would never reach the recorder
+    
+    if args.serve or args.replay:
+        server = make_standin_server(
+            FixtureStore(args.serve or args.replay),
+            port=args.port if args.serve else 0,
+            latency=args.latency / 1000,
+            jitter=args.jitter / 1000,
+            error_rate=args.error_rate,
+            quiet=bool(args.replay)
+        )
+        if args.serve:
+            print(f"Serving fixtures from {args.serve} at {server.base_url}", file=sys.stderr)
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            return
+        server.start()
+        weather_client.base_url = server.base_url
+    
+    if args.build_gazetteer:
+        try:
+            count = build_gazetteer(read_place_source(args.build_gazetteer))
+        except (OSError, ValueError) as e:
+            print(f"Could not build gazetteer: {str(e)}", file=sys.stderr)
+            sys.exit(2)
+        print(f"Indexed {count} places into {GAZETTEER_FILE} ({os.path.getsize(GAZETTEER_FILE) // 1024} KB)", file=sys.stderr)
+        return
+    
+    if args.batch:
+        concurrency = args.concurrency or BATCH_CONCURRENCY
+        try:
+            if args.batch == "-":
+                status = run_batch(sys.stdin, concurrency)
+            else:
+                with open(args.batch, "r", encoding="utf-8") as f:
+                    status = run_batch(f, concurrency)
+        except OSError as e:
+            print(f"Could not read locations: {str(e)}", file=sys.stderr)
+            status = 2
+        if args.timings_out:
+            latency.export(args.timings_out)
+        sys.exit(status)
+    
     app = WeatherDashboard()
     app.current_location = args.location
+    app.refresh_debounce = args.refresh_debounce
+    app.show_favorites = args.favorites
+    app.background_refresh = not args.no_auto_refresh
+    app.favorites_concurrency = args.concurrency or FAVORITES_CONCURRENCY
     app.run()
+    
+    if args.timings_out:
+        latency.export(args.timings_out)
+    if args.startup_report:
+        for name in ("imports", "ui_ready", "first_paint", "fresh_data"):
+            seconds = startup_timings.get(name)
+            shown = f"{seconds * 1000:.0f} ms" if seconds is not None else "not reached"
+            print(f"{name:12} {shown}", file=sys.stderr)
 
 if __name__ == "__main__":
     main()